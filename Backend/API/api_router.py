@@ -1,4 +1,6 @@
+import asyncio
 import fastapi 
+from datetime import date, datetime, time, timedelta, timezone
 # import request/response schema models
 from API.model.GET_finance_data import RequestFinanceData
 from API.model.GET_login_request import LoginRequest
@@ -13,18 +15,43 @@ from API.model.POST_transaction_data import TransactionPostRequest
 from API.model.POST_target import TargetPostRequest
 
 from services.authentication.controller.auth_controller import LoginController, RegisterController
-from services.finance.finance_data_scraper import get_finance_data
-from services.finance.currency_conversion import currency_conversion, items_currency_conversion
-from services.transaction.transaction import TransactionController
-from services.user_target.target import TargetController
+from services.finance.finance_data_scraper import get_finance_data, market_cache, DEFAULT_CURRENCIES
+from services.finance.currency_conversion import currency_conversion, items_currency_conversion, get_rate_snapshot
+from services.finance.rate_table import rate_table
+from services.finance.price_history import PriceHistoryStore, HISTORY_INTERVALS
+from services.finance.market_cache import ASSET_CLASSES, CACHE_TTLS
+from services.finance.ohlcv import BAR_FORMATS
+from services.transaction.transaction import TransactionController, decode_page_cursor, SUMMARY_PERIODS
+from services.transaction.bulk_import import iter_csv_rows, iter_json_array_items, iter_ndjson_items
+from services.user_target.target import TargetController, PROGRESS_PERIODS, period_start
 from services.assets.asset import AssetController
+from services.export.export import ExportController
+from services.database.write_versions import UserWriteVersions, WRITE_RESOURCES
+from API.dependencies import authenticated_user_id, body_authenticated_user_id
+from API.http_cache import cached_json, conditional_json, make_etag, last_modified, MARKET_CACHE_CONTROL
+from services.monitoring.metrics import render_metrics
 
-from pymongo.mongo_client import MongoClient
+from pymongo import AsyncMongoClient
 
-from fastapi import HTTPException
+from fastapi import Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MAX_PAGE_SIZE = 1000
+MAX_HISTORY_DAYS = 5 * 366
+DASHBOARD_TRANSACTIONS = 20
+
+
+def _market_marker() -> tuple:
+    # prices can move without a merge this worker saw (another worker, a stale symbol refreshed on read),
+    # so cached valuations also roll over once per crypto TTL.
+    # both are datetimes, so valuation routes add them to their Last-Modified as well as their ETag
+    ttl = CACHE_TTLS["crypto"].total_seconds()
+    rollover = datetime.fromtimestamp(datetime.now(timezone.utc).timestamp() // ttl * ttl, timezone.utc)
+    return market_cache.time_retrieved(), rollover
 
 class APIRouteDefintion:
-    def __init__(self, router: fastapi.APIRouter, database_client: MongoClient):
+    def __init__(self, router: fastapi.APIRouter, database_client: AsyncMongoClient):
         self.router = router
         self.database_client = database_client
         self.login_controller = LoginController(database_entity=database_client)
@@ -32,6 +59,9 @@ class APIRouteDefintion:
         self.transaction_controller = TransactionController(database_entity= database_client)
         self.target_controller = TargetController(database_entity= database_client)
         self.assets_controller = AssetController(database_entity=database_client)
+        self.export_controller = ExportController(database_entity=database_client)
+        self.price_history = PriceHistoryStore(database_entity=database_client)
+        self.write_versions = UserWriteVersions(database_entity=database_client)
 
         # route defintion
         self.router.add_api_route("/login", self._get_login_operation, methods=["POST"])
@@ -39,19 +69,39 @@ class APIRouteDefintion:
 
         self.router.add_api_route("/finance", self._get_finance_data_operation, methods=["POST"])
         self.router.add_api_route("/finance/USD{to_currency}", self._get_usd_conversion_rate, methods=["GET"])
+        self.router.add_api_route("/finance/history", self._get_price_history, methods=["GET"])
 
         self.router.add_api_route("/transaction/{token}/{currency}",  self._get_transactions_by_user, methods=["GET"])
         self.router.add_api_route("/transaction/{token}",  self._post_transaction_data, methods=["POST"])
+        self.router.add_api_route("/transaction/{token}/import", self._import_transactions, methods=["POST"])
+        self.router.add_api_route("/transaction/{token}/{currency}/summary", self._get_transaction_summary, methods=["GET"])
+        self.router.add_api_route("/transaction/{token}/{currency}/balance", self._get_transaction_balance, methods=["GET"])
 
         self.router.add_api_route("/asset/{token}/{currency}", self._get_assest_by_user, methods=["GET"])
+        self.router.add_api_route("/asset/{token}/{currency}/history", self._get_net_worth_history, methods=["GET"])
         self.router.add_api_route("/asset/{token}", self._add_assest_by_user, methods=["POST"])
         self.router.add_api_route("/asset/{token}", self._modify_assest_by_item, methods=["PUT"])
         self.router.add_api_route("/asset/{token}/{asset_id}", self._delete_asset_by_item, methods=["DELETE"])
         
         self.router.add_api_route("/target/{token}/{currency}", self._get_targets_by_user, methods=["GET"])
+        self.router.add_api_route("/target/{token}/{currency}/progress", self._get_target_progress, methods=["GET"])
         self.router.add_api_route("/target", self._insert_target, methods=["POST"]) 
         self.router.add_api_route("/target/{token}", self._delete_target_by_user, methods=["DELETE"])
 
+        self.router.add_api_route("/export/{token}", self._export_by_user, methods=["GET"])
+
+        self.router.add_api_route("/dashboard/{token}/{currency}", self._get_dashboard, methods=["GET"])
+
+        self.router.add_api_route("/metrics", self._get_metrics, methods=["GET"], include_in_schema=False)
+
+
+    async def _user_validator(self, user_id: str, resources: tuple, currency: str) -> tuple:
+        # (what a per-user body depends on, its Last-Modified): the write versions and the rates it converts with.
+        # a stale rate table is refreshed first so the validator matches the rates the body will use
+        versions, modified = await self.write_versions.get(user_id, resources)
+        await get_rate_snapshot([currency])
+        rates_retrieved = rate_table.time_retrieved()
+        return (versions, rates_retrieved), last_modified(modified, rates_retrieved)
 
     # endpoint: _____/login, method: GET
     async def _get_login_operation(self, request_entity: LoginRequest):
@@ -67,84 +117,330 @@ class APIRouteDefintion:
         return await self.register_controller.register_credential(register_load)
     
 
-    # endpoint: _____/finance, method: POST
-    async def _get_finance_data_operation(self, request_entity: RequestFinanceData):
+    # endpoint: _____/finance?format=columns|rows, method: POST
+    async def _get_finance_data_operation(
+        self,
+        request: Request,
+        request_entity: RequestFinanceData,
+        format: str = Query(default="columns", pattern=f"^({'|'.join(BAR_FORMATS)})$"),
+    ):
         requested_items = request_entity.model_dump()
         finance_data_response = await get_finance_data(
-            currencies=requested_items['currency'], stocks=requested_items['stock'], cryptos=requested_items['crypto']
+            currencies=requested_items['currency'], stocks=requested_items['stock'], cryptos=requested_items['crypto'],
+            bar_format=format,
         )
         if finance_data_response is None:
             raise HTTPException(status_code=404, detail="Finance Data Not Found")
-        return finance_data_response
+
+        # the body is only known after the lookup, so no response cache here, a current client still gets a 304.
+        # a missing list means the defaults, which differs from an empty one
+        key = ("finance", *(
+            None if requested_items[name] is None else tuple(requested_items[name])
+            for name in ("currency", "stock", "crypto")
+        ), format)
+        retrieved = (finance_data_response["timeRetrieved"], rate_table.time_retrieved())
+        return conditional_json(
+            request, make_etag(*key, *retrieved), last_modified(*retrieved), finance_data_response, MARKET_CACHE_CONTROL
+        )
     
     # endpoint: _____/finance/USD{to_currency}, method: GET
-    async def _get_usd_conversion_rate(self, to_currency: str):
+    async def _get_usd_conversion_rate(self, request: Request, to_currency: str):
         conversion_rate = await currency_conversion("USD", to_currency, 1)
         if conversion_rate is None:
             raise HTTPException(status_code=404, detail="Currency Not Found")
-        return conversion_rate
 
+        async def compute():
+            return conversion_rate
+
+        key = ("usd_rate", to_currency.upper())
+        retrieved = rate_table.time_retrieved()
+        return await cached_json(
+            request, key, make_etag(*key, retrieved), last_modified(retrieved), compute, MARKET_CACHE_CONTROL
+        )
+
+    # endpoint: _____/finance/history?symbol=AAPL&asset_class=stock&interval=1d&start=&end=&format=columns|rows, method: GET
+    async def _get_price_history(
+        self,
+        symbol: str,
+        asset_class: str = Query(default="stock", pattern=f"^({'|'.join(ASSET_CLASSES)})$"),
+        interval: str = Query(default="1d", pattern=f"^({'|'.join(HISTORY_INTERVALS)})$"),
+        start: date | None = None,
+        end: date | None = None,
+        format: str = Query(default="columns", pattern=f"^({'|'.join(BAR_FORMATS)})$"),
+    ):
+        # dates are inclusive, a month of daily bars by default
+        end = end or datetime.now(timezone.utc).date()
+        start = start or end - timedelta(days=30)
+        if start > end:
+            raise HTTPException(status_code=400, detail='start must not be after end')
+        return await self.price_history.get_history(
+            symbol,
+            asset_class,
+            interval,
+            datetime.combine(start, time(), timezone.utc),
+            datetime.combine(end + timedelta(days=1), time(), timezone.utc),
+            format,
+        )
+
+
+    # endpoint: _____/transaction/{token}/{currency}?limit=&after=&format=json|ndjson, method: GET
+    async def _get_transactions_by_user(
+        self,
+        request: Request,
+        currency: str,
+        limit: int | None = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+        after: str | None = None,
+        format: str = Query(default="json", pattern="^(json|ndjson)$"),
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        try:
+            after_position = decode_page_cursor(after) if after else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail='Invalid Cursor')
+
+        if format == "ndjson":
+            return StreamingResponse(
+                self.transaction_controller.stream_transactions(user_id, currency, limit, after_position),
+                media_type="application/x-ndjson",
+            )
+
+        async def compute():
+            # the body stays a plain list, the next page cursor travels in a header
+            transactions, next_cursor = await self.transaction_controller.get_transactions_by_user(
+                user_id, currency, limit, after_position
+            )
+            headers = {} if next_cursor is None else {"X-Next-Cursor": next_cursor}
+            return JSONResponse(jsonable_encoder(transactions), headers=headers)
 
-    # endpoint: _____/transaction, method: GET
-    async def _get_transactions_by_user(self, token:str, currency: str):
-        return await self.transaction_controller.get_transactions_by_user(token, currency)
+        validator, modified = await self._user_validator(user_id, ("transaction",), currency)
+        key = ("transactions", user_id, currency.upper(), limit, after)
+        return await cached_json(request, key, make_etag(*key, validator), modified, compute)
        
+    # endpoint: _____/transaction/{token}/{currency}/summary?period=day|week|month&start=&end=, method: GET
+    async def _get_transaction_summary(
+        self,
+        request: Request,
+        currency: str,
+        period: str = Query(default="month", pattern=f"^({'|'.join(SUMMARY_PERIODS)})$"),
+        start: date | None = None,
+        end: date | None = None,
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        async def compute():
+            return await self.transaction_controller.get_transaction_summary(user_id, currency, period, start, end)
+
+        validator, modified = await self._user_validator(user_id, ("transaction",), currency)
+        key = ("transaction_summary", user_id, currency.upper(), period, start, end)
+        return await cached_json(request, key, make_etag(*key, validator), modified, compute)
+
+    # endpoint: _____/transaction/{token}/{currency}/balance?month=YYYY-MM, method: GET
+    async def _get_transaction_balance(
+        self,
+        request: Request,
+        currency: str,
+        month: str | None = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        async def compute():
+            return await self.transaction_controller.get_balance(user_id, currency, month)
+
+        validator, modified = await self._user_validator(user_id, ("transaction",), currency)
+        key = ("transaction_balance", user_id, currency.upper(), month)
+        return await cached_json(request, key, make_etag(*key, validator), modified, compute)
+
     # endpoint: _____/transaction, method: POST
-    async def _post_transaction_data(self, token, request_entity: TransactionPostRequest ):
+    async def _post_transaction_data(
+        self, request_entity: TransactionPostRequest, user_id: str = Depends(authenticated_user_id)
+    ):
         transaction_item = request_entity.model_dump()
-        return await self.transaction_controller.insert_transaction(token, transaction_item)
+        return await self.transaction_controller.insert_transaction(user_id, transaction_item)
+
+
+    # endpoint: _____/transaction/{token}/import, method: POST
+    # body: text/csv with a header row, application/x-ndjson, or a JSON array of TransactionPostRequest rows
+    async def _import_transactions(self, request: Request, user_id: str = Depends(authenticated_user_id)):
+        content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+        if content_type == "text/csv":
+            rows = iter_csv_rows(request.stream())
+        elif content_type in ("application/x-ndjson", "application/jsonl"):
+            rows = iter_ndjson_items(request.stream())
+        else:
+            rows = iter_json_array_items(request.stream())
 
+        import_response = await self.transaction_controller.import_transactions(user_id, rows)
+        if import_response['status'] != 200:
+            raise HTTPException(status_code=import_response['status'], detail=import_response)
+        return import_response
 
     # endpoint: _____/target, method: POST
-    async def _insert_target(self, request_entity: TargetPostRequest):
+    async def _insert_target(self, request_entity: TargetPostRequest, user_id: str = Depends(body_authenticated_user_id)):
         target_item = request_entity.model_dump()
         return await self.target_controller.insert_target(
-            target_item['token'], target_item['target_type'], target_item['amount'], target_item['currency']
+            user_id, target_item['target_type'], target_item['amount'], target_item['currency']
         )
     
     # endpoint: _____/target, method: GET
-    async def _get_targets_by_user(self, token: str, currency: str):
-        # check if token and currency are provided
-        if not token or not currency:
+    async def _get_targets_by_user(self, request: Request, currency: str, user_id: str = Depends(authenticated_user_id)):
+        # check if currency is provided
+        if not currency:
             raise HTTPException(status_code=400, detail='Bad Request')
-        
-        targets = await self.target_controller.get_targets_by_user(token)
 
-        # raise error if no targets found
-        if (targets['status'] != 200):
-            raise HTTPException(status_code=targets['status'], detail=targets['message'])
-        
-        converted_targets = await items_currency_conversion(targets['targets'], currency.upper())
-        return {
-            "targets": converted_targets
-        }
+        async def compute():
+            targets = await self.target_controller.get_targets_by_user(user_id)
+
+            # raise error if no targets found
+            if (targets['status'] != 200):
+                raise HTTPException(status_code=targets['status'], detail=targets['message'])
+
+            converted_targets = await items_currency_conversion(targets['targets'], currency.upper())
+            return {
+                "targets": converted_targets
+            }
+
+        validator, modified = await self._user_validator(user_id, ("target",), currency)
+        key = ("targets", user_id, currency.upper())
+        return await cached_json(request, key, make_etag(*key, validator), modified, compute)
+
+    # endpoint: _____/target/{token}/{currency}/progress?period=week|month|year|all, method: GET
+    async def _get_target_progress(
+        self,
+        request: Request,
+        currency: str,
+        period: str = Query(default="month", pattern=f"^({'|'.join(PROGRESS_PERIODS)})$"),
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        async def compute():
+            return await self.target_controller.get_target_progress(user_id, currency, period)
+
+        # a new period starts counting from zero without any write
+        validator, modified = await self._user_validator(user_id, ("transaction", "target"), currency)
+        key = ("target_progress", user_id, currency.upper(), period)
+        etag = make_etag(*key, validator, period_start(period, datetime.now(timezone.utc)))
+        return await cached_json(request, key, etag, modified, compute)
 
     # endpoint: _____/target, method: DELETE
-    async def _delete_target_by_user(self, token: str):
-        if not token:
-            raise HTTPException(status_code=400, detail='Bad Request')
-        return await self.target_controller.delete_target_by_user(token)
+    async def _delete_target_by_user(self, user_id: str = Depends(authenticated_user_id)):
+        return await self.target_controller.delete_target_by_user(user_id)
+
 
+    async def _get_assest_by_user(self, request: Request, currency:str, user_id: str = Depends(authenticated_user_id)):
+        async def compute():
+            return await self.assets_controller.get_asset(user_id, currency)
 
-    async def _get_assest_by_user(self, token: str,currency:str):
-        if not token:
-            raise HTTPException(status_code=400, detail='Invalid Token')
-        return await self.assets_controller.get_asset(token, currency)
+        validator, modified = await self._user_validator(user_id, ("asset",), currency)
+        key = ("assets", user_id, currency.upper())
+        market = _market_marker()
+        return await cached_json(
+            request, key, make_etag(*key, validator, market), last_modified(modified, *market), compute
+        )
     
-    async def _add_assest_by_user(self, token:str, request_entity: InsertAssetRequest):
-        if not token:
-            raise HTTPException(status_code=400, detail='Invalid Token')
-        assets = request_entity.model_dump()
-        return await self.assets_controller.add_asset(token, assets)
+    # endpoint: _____/asset/{token}/{currency}/history?start=&end=, method: GET
+    async def _get_net_worth_history(
+        self,
+        request: Request,
+        currency: str,
+        start: date | None = None,
+        end: date | None = None,
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        # a year of daily values by default
+        end = end or datetime.now(timezone.utc).date()
+        start = start or end - timedelta(days=365)
+        if start > end:
+            raise HTTPException(status_code=400, detail='start must not be after end')
+        if (end - start).days > MAX_HISTORY_DAYS:
+            raise HTTPException(status_code=400, detail=f'range is limited to {MAX_HISTORY_DAYS} days')
+
+        async def compute():
+            history = await self.assets_controller.get_net_worth_history(user_id, currency, start, end)
+            if history['status'] != 200:
+                raise HTTPException(status_code=history['status'], detail=history['error'])
+            return history
+
+        validator, modified = await self._user_validator(user_id, ("asset",), currency)
+        key = ("net_worth", user_id, currency.upper(), start, end)
+        market = _market_marker()
+        return await cached_json(
+            request, key, make_etag(*key, validator, market), last_modified(modified, *market), compute
+        )
     
-    async def _modify_assest_by_item(self, token:str, request_entity: UpdateAssetRequest):
-        if not token:
-            raise HTTPException(status_code=400, detail='Invalid Token')
+    async def _add_assest_by_user(self, request_entity: InsertAssetRequest, user_id: str = Depends(authenticated_user_id)):
+        assets = request_entity.model_dump()
+        return await self.assets_controller.add_asset(user_id, assets)
     
-        return await self.assets_controller.modify_asset(token, request_entity)
+    async def _modify_assest_by_item(self, request_entity: UpdateAssetRequest, user_id: str = Depends(authenticated_user_id)):
+        return await self.assets_controller.modify_asset(user_id, request_entity)
     
-    async def _delete_asset_by_item(self, token:str, asset_id: str ):
-        if not token:
-            raise HTTPException(status_code=400, detail='Invalid Token')
-        
-        return await self.assets_controller.del_asset(token, asset_id)
+    async def _delete_asset_by_item(self, asset_id: str, user_id: str = Depends(authenticated_user_id)):
+        return await self.assets_controller.del_asset(user_id, asset_id)
+
+
+    # endpoint: _____/export/{token}?resource=transactions|assets&format=csv|ndjson&currency=, method: GET
+    async def _export_by_user(
+        self,
+        resource: str = Query(default="transactions", pattern="^(transactions|assets)$"),
+        format: str = Query(default="csv", pattern="^(csv|ndjson)$"),
+        currency: str | None = None,
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(
+            self.export_controller.export(user_id, resource, format, currency),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{resource}.{format}"'},
+        )
+
+
+    # endpoint: _____/dashboard/{token}/{currency}?transactions=20, method: GET
+    async def _get_dashboard(
+        self,
+        request: Request,
+        currency: str,
+        transactions: int = Query(default=DASHBOARD_TRANSACTIONS, ge=1, le=MAX_PAGE_SIZE),
+        user_id: str = Depends(authenticated_user_id),
+    ):
+        # one token check and one rate snapshot shared by every section, the Mongo reads run concurrently
+        currency = currency.upper()
+
+        async def compute():
+            # the snapshot must cover every currency the user has, not just those the rate table already knows
+            asset_currencies, transaction_currencies, targets = await asyncio.gather(
+                self.assets_controller.get_currencies(user_id),
+                self.transaction_controller.get_currencies(user_id),
+                self.target_controller.get_targets_by_user(user_id),
+            )
+            currencies = sorted({
+                *DEFAULT_CURRENCIES, currency, *rate_table.currencies(), *asset_currencies, *transaction_currencies,
+                *(target["currency"].upper() for target in targets['targets']),
+            })
+            rates = await get_rate_snapshot(currencies)
+
+            assets, (recent_transactions, next_cursor) = await asyncio.gather(
+                self.assets_controller.get_asset(user_id, currency, rates),
+                self.transaction_controller.get_transactions_by_user(user_id, currency, transactions, rates=rates),
+            )
+            converted_targets = await items_currency_conversion(targets['targets'], currency, rates)
+
+            time_retrieved = rates.time_retrieved()
+            return {
+                "currency": currency,
+                "assets": assets['assets'],
+                "transactions": recent_transactions,
+                "next_cursor": next_cursor,
+                "targets": converted_targets,
+                "rates": rates.cross_rates(currencies),
+                "timeRetrieved": time_retrieved and str(time_retrieved),
+            }
+
+        validator, modified = await self._user_validator(user_id, WRITE_RESOURCES, currency)
+        key = ("dashboard", user_id, currency, transactions)
+        market = _market_marker()
+        return await cached_json(
+            request, key, make_etag(*key, validator, market), last_modified(modified, *market), compute
+        )
+
+
+    # endpoint: _____/metrics, method: GET (Prometheus text format)
+    async def _get_metrics(self):
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
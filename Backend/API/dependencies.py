@@ -0,0 +1,18 @@
+from fastapi import HTTPException
+from API.model.POST_target import TargetPostRequest
+from services.authentication.token.access_token import JWTGenerator
+
+token_generator = JWTGenerator()
+
+
+def authenticated_user_id(token: str) -> str:
+    # resolved once per request from the {token} path segment; verified claims are cached until exp
+    user_payload = token_generator.verify_jwt_token(token)
+    if not user_payload or "user_id" not in user_payload:
+        raise HTTPException(status_code=401, detail='Invalid Token')
+    return str(user_payload['user_id'])
+
+
+def body_authenticated_user_id(request_entity: TargetPostRequest) -> str:
+    # same check for the endpoints that carry the token in the json body instead of the path
+    return authenticated_user_id(request_entity.token)
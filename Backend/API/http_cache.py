@@ -0,0 +1,139 @@
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from services.monitoring.metrics import CACHE_LOOKUPS
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# clients may keep a copy but must revalidate it, a 304 costs no recomputation
+USER_CACHE_CONTROL = "private, no-cache"
+MARKET_CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*parts) -> str:
+    # parts: everything the body depends on, e.g. the route, its parameters and the write versions
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:32] + '"'
+
+
+def _utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def last_modified(*moments) -> datetime | None:
+    # newest of the given datetimes / ISO strings, ignoring missing ones
+    parsed = [_utc(datetime.fromisoformat(m) if isinstance(m, str) else m) for m in moments if m is not None]
+    return max(parsed, default=None)
+
+
+def is_not_modified(request: Request, etag: str, modified: datetime | None) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # the header only has second precision
+    return since.tzinfo is not None and modified.replace(microsecond=0) <= since
+
+
+class ResponseCache:
+    # serialized bodies keyed per route/user/parameters, an entry is only served while its ETag still matches
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, max_bytes: int = RESPONSE_CACHE_MAX_BYTES) -> None:
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._entries: OrderedDict[tuple, tuple[str, bytes, dict]] = OrderedDict()
+
+    def get(self, key: tuple, etag: str) -> tuple[bytes, dict] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != etag:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1], entry[2]
+
+    def put(self, key: tuple, etag: str, body: bytes, headers: dict) -> None:
+        self.discard(key)
+        if len(body) > self._max_bytes:
+            return
+        self._entries[key] = (etag, body, headers)
+        self._size += len(body)
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def discard(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
+
+
+def _validator_headers(etag: str, modified: datetime | None, cache_control: str) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def conditional_json(
+    request: Request, etag: str, modified: datetime | None, content, cache_control: str = USER_CACHE_CONTROL
+) -> Response:
+    # for bodies that are already built when the validator is known: 304 or the content, nothing is cached
+    headers = _validator_headers(etag, modified, cache_control)
+    if is_not_modified(request, etag, modified):
+        CACHE_LOOKUPS.labels("response", "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(content), headers=headers)
+
+
+async def cached_json(
+    request: Request,
+    key: tuple,
+    etag: str,
+    modified: datetime | None,
+    compute: Callable[[], Awaitable],
+    cache_control: str = USER_CACHE_CONTROL,
+) -> Response:
+    # 304 when the client's copy is current, else the cached body, else compute and cache it.
+    # compute returns the content, or a Response whose body and headers are cached as is
+    headers = _validator_headers(etag, modified, cache_control)
+    if is_not_modified(request, etag, modified):
+        CACHE_LOOKUPS.labels("response", "not_modified").inc()
+        return Response(status_code=304, headers=headers)
+
+    cached = response_cache.get(key, etag)
+    CACHE_LOOKUPS.labels("response", "miss" if cached is None else "hit").inc()
+    if cached is None:
+        content = await compute()
+        rendered = content if isinstance(content, Response) else JSONResponse(jsonable_encoder(content))
+        extra_headers = {
+            name: value for name, value in rendered.headers.items() if name.lower() not in ("content-length", "content-type")
+        }
+        cached = (rendered.body, extra_headers)
+        response_cache.put(key, etag, *cached)
+
+    body, extra_headers = cached
+    return Response(body, media_type="application/json", headers={**extra_headers, **headers})
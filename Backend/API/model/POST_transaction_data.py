@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Dict, Any
 class TransactionPostRequest(BaseModel):
-     type: str
-     category_type: str
+     # both become rollup field names, an empty one would make an invalid path
+     type: str = Field(min_length=1)
+     category_type: str = Field(min_length=1)
      currency_type: str
      amount: float
      date: str
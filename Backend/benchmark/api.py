@@ -0,0 +1,183 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+from API import http_cache
+from API.api_router import APIRouteDefintion
+from services.authentication.controller.auth_controller import RegisterController
+from services.monitoring.metrics import MetricsMiddleware
+from services.transaction.transaction import TransactionController, IMPORT_BATCH_SIZE
+from services.database.indexes import DATABASE_NAME
+from .stats import summarize
+
+PASSWORD = "benchmark-password"
+CURRENCIES = ["HKD", "USD", "JPY", "CNY"]
+CATEGORIES = ["food", "transport", "rent", "salary", "shopping", "entertainment", "health", "travel"]
+STOCKS = ["AAPL", "AMZN", "GOOG", "NVDA", "MSFT", "META", "TSLA", "NFLX", "AMD", "INTC", "ORCL", "IBM"]
+CRYPTOS = ["BTC", "ETH", "DOGE", "USDT", "SOL", "ADA"]
+
+
+def create_app(database_client) -> FastAPI:
+    # the same routes and middleware as main.py, without the lifespan (no prefetcher, no index build)
+    app = FastAPI()
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(MetricsMiddleware)
+    router = APIRouter()
+    APIRouteDefintion(router, database_client)
+    app.include_router(router)
+    return app
+
+
+@dataclass
+class SeededUser:
+    username: str
+    user_id: str
+    token: str
+
+
+async def seed(database_client, users: int, transactions: int, assets: int, seed: int = 4521) -> list[SeededUser]:
+    # users registered through the controller (real bcrypt hashes), histories bulk inserted like an import
+    rng = random.Random(seed)
+    register = RegisterController(database_client)
+    transaction_controller = TransactionController(database_client)
+    transaction_collection = database_client[DATABASE_NAME]["transaction"]
+    asset_collection = database_client[DATABASE_NAME]["assets"]
+    now = datetime.now(timezone.utc)
+
+    seeded = []
+    for index in range(users):
+        username = f"benchmark-user-{index}"
+        registered = await register.register_credential({"username": username, "password": PASSWORD})
+        if registered["status"] != 200:
+            raise RuntimeError(f"could not register {username}: {registered}")
+        user = SeededUser(username, registered["user_id"], registered["token"])
+        seeded.append(user)
+
+        batch = []
+        for _ in range(transactions):
+            day = now - timedelta(days=rng.randrange(3 * 365))
+            payload = {
+                "type": rng.choice(["expense", "expense", "expense", "income"]),
+                "category_type": rng.choice(CATEGORIES),
+                "currency_type": rng.choice(CURRENCIES),
+                "amount": round(rng.uniform(1, 2000), 2),
+                "date": f"{day.year}-{day.month}-{day.day}",
+            }
+            batch.append(transaction_controller._transaction_document(user.user_id, payload))
+            if len(batch) == IMPORT_BATCH_SIZE:
+                await transaction_collection.insert_many(batch)
+                batch = []
+        if batch:
+            await transaction_collection.insert_many(batch)
+
+        holdings = []
+        for _ in range(assets):
+            category = rng.choice(["STOCK", "STOCK", "CRYPTO", "CURRENCY"])
+            symbol = {"STOCK": STOCKS, "CRYPTO": CRYPTOS, "CURRENCY": CURRENCIES}[category]
+            created_at = now - timedelta(days=rng.randrange(365))
+            holdings.append({
+                "user_id": user.user_id,
+                "category": category,
+                "type": rng.choice(symbol),
+                "amount": rng.randrange(1, 100),
+                "created_at": created_at,
+                "updated_at": created_at,
+            })
+        if holdings:
+            await asset_collection.insert_many(holdings)
+    return seeded
+
+
+@dataclass
+class Scenario:
+    name: str
+    requests: int
+    # request number -> (method, url, httpx request kwargs)
+    build: Callable[[int], tuple]
+
+
+def scenarios(users: list[SeededUser], page_size: int) -> list[Scenario]:
+    def user(index: int) -> SeededUser:
+        return users[index % len(users)]
+
+    finance_body = {"currency": CURRENCIES, "stock": STOCKS[:4], "crypto": CRYPTOS[:4]}
+    return [
+        Scenario("login", 50, lambda i: ("POST", "/login", {"json": {"username": user(i).username, "password": PASSWORD}})),
+        Scenario(
+            "transactions_page", 300, lambda i: ("GET", f"/transaction/{user(i).token}/HKD?limit={page_size}", {})
+        ),
+        Scenario("transactions_all", 20, lambda i: ("GET", f"/transaction/{user(i).token}/HKD", {})),
+        Scenario("assets", 200, lambda i: ("GET", f"/asset/{user(i).token}/HKD", {})),
+        Scenario("dashboard", 100, lambda i: ("GET", f"/dashboard/{user(i).token}/HKD", {})),
+        Scenario("finance", 300, lambda i: ("POST", "/finance", {"json": finance_body})),
+        Scenario("finance_rows", 100, lambda i: ("POST", "/finance?format=rows", {"json": finance_body})),
+        Scenario("finance_rate", 500, lambda i: ("GET", "/finance/USDHKD", {})),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = Counter()
+    numbers = iter(range(requests))
+
+    async def worker():
+        # workers share one iterator, so exactly `requests` requests go out in total
+        for number in numbers:
+            method, url, kwargs = scenario.build(number)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+async def run_api_benchmarks(
+    database_client,
+    users: int,
+    transactions: int,
+    assets: int,
+    concurrency: int,
+    page_size: int,
+    warmup: int,
+    request_scale: float,
+    response_cache: bool,
+    only: list = None,
+    log: Callable[[str], None] = print,
+) -> dict:
+    if not response_cache:
+        # measure the work behind each endpoint rather than replaying cached bodies
+        http_cache.response_cache = http_cache.ResponseCache(max_entries=0)
+
+    started = time.perf_counter()
+    seeded = await seed(database_client, users, transactions, assets)
+    log(f"seeded {users} users x {transactions} transactions / {assets} assets in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    transport = httpx.ASGITransport(app=create_app(database_client))
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for scenario in scenarios(seeded, page_size):
+            if only and scenario.name not in only:
+                continue
+            # warm-up fills the market data cache and the token cache, like a running server
+            await run_scenario(client, scenario, warmup, 1)
+            requests = max(int(scenario.requests * request_scale), 1)
+            results[scenario.name] = await run_scenario(client, scenario, requests, concurrency)
+            log(_format_row(scenario.name, results[scenario.name]))
+    return results
+
+
+def _format_row(name: str, result: dict) -> str:
+    return (
+        f"{name:<20} {result['requests']:>6} req  {result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}"
+    )
@@ -0,0 +1,36 @@
+import argparse
+import json
+import sys
+from .stats import compare
+
+# python -m benchmark.compare benchmark/results/<baseline>.json benchmark/results/<current>.json [--threshold 0.1]
+# exits 1 when any p50/p99/median got slower than the threshold, so it can gate CI
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description="compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.10 = 10%%")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline.get("config") != current.get("config") or baseline.get("backend") != current.get("backend"):
+        print("warning: the runs used different settings, differences may not be regressions")
+
+    rows = compare(baseline, current, args.threshold)
+    print(f"{baseline.get('commit')} -> {current.get('commit')}")
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['benchmark']:<34} {row['metric']:<10} {row['baseline']:>12.2f} -> {row['current']:>12.2f} "
+            f"{row['change']:>+8.1%} {flag}"
+        )
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from services.assets.net_worth import net_worth_frame
+from services.authentication.token.access_token import JWTGenerator, verified_tokens
+from services.authentication.token.encryption import hash_password, verify_password
+from services.finance.ohlcv import columns_to_rows, frame_to_columns
+from services.finance.rate_table import RateTable
+from .yfinance_stub import StubTicker
+
+
+def measure(func, number: int, repeat: int = 5) -> dict:
+    # `repeat` timings of `number` calls each, reported per call
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "best_us": 1e6 * min(timings),
+        "median_us": 1e6 * statistics.median(timings),
+    }
+
+
+def _cases() -> dict:
+    generator = JWTGenerator()
+    token = generator.create_jwt_token({"user_id": "benchmark"})
+
+    def verify_uncached():
+        verified_tokens.clear()
+        generator.verify_jwt_token(token)
+
+    hashed = hash_password("benchmark-password")
+    frame = StubTicker("AAPL").history(period="1d", interval="1m")
+    columns = frame_to_columns(frame)
+
+    rates = RateTable()
+    rates.update({"USDHKD=X": 7.8, "USDJPY=X": 150.0, "USDCNY=X": 7.2}, str(datetime.now(timezone.utc)))
+    rng = np.random.default_rng(4521)
+    amounts = rng.uniform(1, 2000, 10_000).tolist()
+    currencies = rng.choice(["HKD", "USD", "JPY", "CNY"], 10_000).tolist()
+
+    dates = pd.date_range(end=pd.Timestamp.now(tz="UTC").normalize(), periods=366, freq="D")
+    symbols = [f"S{i}" for i in range(50)]
+    holdings = pd.DataFrame({
+        "category": "STOCK",
+        "type": symbols,
+        "amount": rng.integers(1, 100, 50).astype(float),
+        "created_at": [dates[0] + timedelta(days=int(day)) for day in rng.integers(0, 366, 50)],
+    })
+    prices = {("STOCK", symbol): pd.Series(rng.uniform(10, 500, len(dates)), index=dates) for symbol in symbols}
+    usd_rates = {"HKD": pd.Series(7.8, index=dates)}
+
+    transactions = [
+        {
+            "type": "expense", "category_type": "food", "currency_type": "HKD", "amount": float(amount),
+            "date": "2025-5-1", "datetime": "2025-05-01T00:00:00+00:00", "created_at": "2025-05-01T08:00:00+00:00",
+            "transaction_id": f"{index:024x}", "converted_amount": float(amount),
+        }
+        for index, amount in enumerate(amounts[:1000])
+    ]
+
+    # name -> (callable, calls per timing)
+    return {
+        "jwt_verify_cached": (lambda: generator.verify_jwt_token(token), 20_000),
+        "jwt_verify_uncached": (verify_uncached, 5_000),
+        "bcrypt_verify": (lambda: verify_password("benchmark-password", hashed), 3),
+        "frame_to_columns_390": (lambda: frame_to_columns(frame), 500),
+        "columns_to_rows_390": (lambda: columns_to_rows(columns), 500),
+        "convert_many_10k": (lambda: rates.convert_many(amounts, currencies, "HKD"), 200),
+        "net_worth_frame_50x366": (lambda: net_worth_frame(holdings, prices, usd_rates, "HKD", dates), 20),
+        "render_transactions_1k": (lambda: JSONResponse(jsonable_encoder(transactions)), 50),
+    }
+
+
+def run_micro_benchmarks(scale: float = 1.0, only: list = None, log=print) -> dict:
+    results = {}
+    for name, (func, number) in _cases().items():
+        if only and name not in only:
+            continue
+        func()
+        results[name] = measure(func, max(int(number * scale), 1))
+        log(f"{name:<26} median {results[name]['median_us']:>12.2f} us  best {results[name]['best_us']:>12.2f} us")
+    return results
@@ -0,0 +1,104 @@
+import mongomock
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+# an in-process stand-in for AsyncMongoClient over mongomock, covering the calls the services make.
+# mongomock is synchronous and copies every document it returns, so absolute numbers include that
+# overhead; compare runs against each other, or pass --mongo-url to measure against a real mongod
+
+
+class AsyncCursor:
+
+    def __init__(self, cursor) -> None:
+        self._cursor = cursor
+        self._iterator = None
+
+    def sort(self, *args, **kwargs) -> "AsyncCursor":
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count: int) -> "AsyncCursor":
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def skip(self, count: int) -> "AsyncCursor":
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def batch_size(self, size: int) -> "AsyncCursor":
+        return self
+
+    async def to_list(self, length: int = None) -> list:
+        documents = list(self._cursor)
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self) -> "AsyncCursor":
+        self._iterator = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+
+    def __init__(self, collection) -> None:
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, pipeline: list, **kwargs) -> AsyncCursor:
+        return AsyncCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        # mongomock's bulk_write rejects current pymongo operation objects, apply them one by one
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self._collection.insert_one(operation._doc)
+            elif isinstance(operation, UpdateOne):
+                self._collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, UpdateMany):
+                self._collection.update_many(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, ReplaceOne):
+                self._collection.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+            elif isinstance(operation, DeleteOne):
+                self._collection.delete_one(operation._filter)
+            elif isinstance(operation, DeleteMany):
+                self._collection.delete_many(operation._filter)
+
+    def __getattr__(self, name: str):
+        # insert_one, find_one, update_one, distinct, ... run synchronously behind an awaitable
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+class AsyncDatabase:
+
+    def __init__(self, database) -> None:
+        self._database = database
+
+    def __getitem__(self, name: str) -> AsyncCollection:
+        return AsyncCollection(self._database[name])
+
+    async def list_collection_names(self) -> list:
+        return self._database.list_collection_names()
+
+
+class AsyncMongoStub:
+
+    def __init__(self) -> None:
+        self._client = mongomock.MongoClient()
+
+    def __getitem__(self, name: str) -> AsyncDatabase:
+        return AsyncDatabase(self._client[name])
+
+    async def close(self) -> None:
+        self._client.close()
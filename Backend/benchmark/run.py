@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+# usage, from Backend/:
+#   pip install -r benchmark/requirements.txt
+#   python -m benchmark.run                       # mongomock, results saved to benchmark/results/<commit>.json
+#   python -m benchmark.run --mongo-url mongodb://localhost:27017 --users 20 --transactions 50000
+#   python -m benchmark.compare benchmark/results/<old>.json benchmark/results/<new>.json
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def commit_id() -> str:
+    # results are keyed by commit, uncommitted changes get their own file
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return f"{commit}-dirty" if dirty else commit
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="API load and micro benchmarks")
+    parser.add_argument("--mongo-url", help="benchmark against a scratch mongod instead of mongomock")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--transactions", type=int, default=10_000, help="transactions seeded per user")
+    parser.add_argument("--assets", type=int, default=40, help="assets seeded per user")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every scenario's request count")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--yfinance-latency", type=float, default=0.0, help="seconds added to each stubbed yfinance call")
+    parser.add_argument("--response-cache", action="store_true", help="keep the in-process response cache on")
+    parser.add_argument("--only", nargs="*", help="scenario or micro benchmark names to run")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", help="results file, default benchmark/results/<commit>.json")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace) -> None:
+    # read by the services at import time, so set before anything from services is imported
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+    os.environ.setdefault("JWT_ALGORITHM", "HS256")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ["FINANCE_CACHE_BACKEND"] = "memory"
+    os.environ["FINANCE_PREFETCH_INTERVAL"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+
+async def _run(args: argparse.Namespace) -> dict:
+    from services.monitoring.log_config import configure_logging
+    from . import yfinance_stub
+
+    configure_logging()
+    yfinance_stub.install(args.yfinance_latency)
+
+    results = {"api": {}, "micro": {}}
+    if not args.skip_api:
+        from .api import run_api_benchmarks
+
+        owns_database = False
+        if args.mongo_url:
+            from services.database.indexes import DATABASE_NAME, ensure_indexes
+            from services.database.mongo_client import create_mongo_client
+
+            database_client = create_mongo_client(args.mongo_url)
+            # the services use a fixed database name, so only an instance without it is used (and dropped after)
+            if await database_client[DATABASE_NAME].list_collection_names():
+                await database_client.close()
+                raise SystemExit(f"--mongo-url must point at a mongod without a {DATABASE_NAME} database")
+            owns_database = True
+            await ensure_indexes(database_client[DATABASE_NAME])
+        else:
+            from pymongo import ASCENDING
+            from services.database.indexes import DATABASE_NAME
+            from .mongo_stub import AsyncMongoStub
+
+            database_client = AsyncMongoStub()
+            # registration is refused until the unique username index exists
+            await database_client[DATABASE_NAME]["credential"].create_index(
+                [("username", ASCENDING)], name="username_unique", unique=True
+            )
+        try:
+            results["api"] = await run_api_benchmarks(
+                database_client,
+                users=args.users,
+                transactions=args.transactions,
+                assets=args.assets,
+                concurrency=args.concurrency,
+                page_size=args.page_size,
+                warmup=args.warmup,
+                request_scale=args.scale,
+                response_cache=args.response_cache,
+                only=args.only,
+            )
+        finally:
+            if owns_database:
+                await database_client.drop_database(DATABASE_NAME)
+            await database_client.close()
+
+    if not args.skip_micro:
+        from .micro import run_micro_benchmarks
+
+        results["micro"] = run_micro_benchmarks(args.scale, args.only)
+    return results
+
+
+def main(argv: list = None) -> None:
+    args = parse_args(argv)
+    configure_environment(args)
+    results = asyncio.run(_run(args))
+
+    commit = commit_id()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "backend": "mongod" if args.mongo_url else "mongomock",
+        "config": {
+            name: value for name, value in vars(args).items() if name not in ("output", "mongo_url", "skip_api", "skip_micro")
+        },
+        **results,
+    }
+    output = args.output or os.path.join(RESULTS_FOLDER, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
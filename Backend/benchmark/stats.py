@@ -0,0 +1,51 @@
+import math
+
+# result fields compared between runs, lower is better for every one of them
+API_METRICS = ("p50_ms", "p99_ms")
+MICRO_METRICS = ("median_us",)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # nearest rank, so p99 of 100 samples is the 99th slowest rather than an interpolation
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: list, wall_seconds: float, statuses: dict) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": len(ordered) / wall_seconds if wall_seconds else 0.0,
+        "mean_ms": 1000 * sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50_ms": 1000 * percentile(ordered, 0.50),
+        "p90_ms": 1000 * percentile(ordered, 0.90),
+        "p99_ms": 1000 * percentile(ordered, 0.99),
+        "max_ms": 1000 * ordered[-1] if ordered else 0.0,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.10) -> list[dict]:
+    # one row per shared metric; regression when current is slower than baseline by more than threshold
+    rows = []
+    for section, metrics in (("api", API_METRICS), ("micro", MICRO_METRICS)):
+        for name, result in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            for metric in metrics:
+                if metric not in result or metric not in before:
+                    continue
+                change = (result[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+                rows.append({
+                    "benchmark": f"{section}.{name}",
+                    "metric": metric,
+                    "baseline": before[metric],
+                    "current": result[metric],
+                    "change": change,
+                    "regression": change > threshold,
+                })
+    return rows
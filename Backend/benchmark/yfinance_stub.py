@@ -0,0 +1,62 @@
+import time
+import zlib
+import numpy as np
+import pandas as pd
+import yfinance
+
+# deterministic synthetic market data in the shapes yfinance returns, so no network is involved
+
+
+def _base_price(symbol: str) -> float:
+    return 10.0 + zlib.crc32(symbol.encode()) % 500
+
+
+def _frame(symbol: str, index: pd.DatetimeIndex) -> pd.DataFrame:
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    close = _base_price(symbol) * np.exp(np.cumsum(rng.normal(0, 0.001, len(index))))
+    return pd.DataFrame(
+        {
+            "Open": close * (1 + rng.normal(0, 0.0005, len(index))),
+            "High": close * 1.001,
+            "Low": close * 0.999,
+            "Close": close,
+            "Volume": rng.integers(1_000, 100_000, len(index)),
+        },
+        index=index,
+    )
+
+
+class StubTicker:
+    latency = 0.0
+
+    def __init__(self, symbol: str) -> None:
+        self.symbol = symbol
+
+    def history(self, period: str = None, interval: str = "1m", start=None, end=None, **kwargs) -> pd.DataFrame:
+        time.sleep(self.latency)
+        if start is None:
+            # one trading day of minute bars, like history(period="1d", interval="1m")
+            end = pd.Timestamp.now(tz="America/New_York").floor("min")
+            return _frame(self.symbol, pd.date_range(end=end, periods=390, freq="min"))
+        freq = "h" if interval == "1h" else "D"
+        return _frame(self.symbol, pd.date_range(pd.Timestamp(start).ceil(freq), pd.Timestamp(end), freq=freq, inclusive="left"))
+
+
+def stub_download(tickers, period: str = "1d", interval: str = "1d", **kwargs) -> pd.DataFrame:
+    # one daily row per ticker with ("Close", ticker) style columns
+    time.sleep(StubTicker.latency)
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    index = pd.DatetimeIndex([pd.Timestamp.now(tz="UTC").normalize()])
+    columns = {
+        (field, ticker): [_base_price(ticker) / 50 if field != "Volume" else 0]
+        for field in ("Open", "High", "Low", "Close", "Volume")
+        for ticker in tickers
+    }
+    return pd.DataFrame(columns, index=index)
+
+
+def install(latency: float = 0.0) -> None:
+    # latency (seconds) simulates the round trip of each yfinance call
+    StubTicker.latency = latency
+    yfinance.Ticker = StubTicker
+    yfinance.download = stub_download
@@ -1,25 +1,45 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
 
+import logging
 import os
 
 load_dotenv()
 MONGO_URL = os.getenv("MONGO_URL")
-print(MONGO_URL)
-
-from API.api_router import APIRouteDefintion
-app = FastAPI()
 
+from services.monitoring.log_config import configure_logging
+configure_logging()
+logger = logging.getLogger("main")
 
-import sys
-print(sys.executable)
+from API.api_router import APIRouteDefintion
+from services.finance.prefetcher import MarketDataPrefetcher
+from services.database.mongo_client import create_mongo_client
+from services.database.indexes import ensure_indexes, DATABASE_NAME
+from services.monitoring.metrics import MetricsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await client.admin.command("ping")
+        logger.info("mongo client connected")
+        await ensure_indexes(client[DATABASE_NAME])
+    except Exception:
+        logger.exception("mongo startup checks failed")
+
+    # keep the market data watchlist warm so request handlers only read cached data
+    prefetcher = MarketDataPrefetcher(client["COMP4521"]["assets"])
+    prefetcher.start()
+    yield
+    await prefetcher.stop()
+    await client.close()
+
+app = FastAPI(lifespan=lifespan)
 
-print("started")
 # Cors settings (later config)
 app.add_middleware(
     CORSMiddleware,
@@ -28,14 +48,11 @@ app.add_middleware(
     allow_methods=["*"],  
     allow_headers=["*"],  
 )
+# outermost, so the recorded latency covers every other middleware too
+app.add_middleware(MetricsMiddleware)
 
 
-client = MongoClient(MONGO_URL, server_api = ServerApi('1'))
-try:
-    client.admim.command("ping")
-    print("<Mongo client> Mongo client creation successfully")
-except Exception as e:
-    print(e)
+client = create_mongo_client(MONGO_URL)
 
 
 
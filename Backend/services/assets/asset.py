@@ -1,26 +1,73 @@
-from pymongo.mongo_client import MongoClient
+import asyncio
+import pandas as pd
+from pymongo import AsyncMongoClient
 from bson import ObjectId
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from ..authentication.token.access_token import JWTGenerator
-from ..finance.currency_conversion import currency_conversion
+from ..finance.currency_conversion import currency_conversion, convert_many
 from services.finance.finance_data_scraper import get_finance_data
+from services.finance.price_history import PriceHistoryStore
+from services.finance.rate_table import BASE_CURRENCY
+from services.database.write_versions import UserWriteVersions
+from .net_worth import daily_closes, net_worth_frame
+
+# categories valued from a USD market price rather than as a currency amount
+PRICED_CATEGORIES = ("STOCK", "CRYPTO")
+
+
+async def get_asset_prices(stocks: list, cryptos: list) -> dict:
+    # latest USD price per symbol, resolved in one lookup, e.g. {"STOCK": {"AAPL": 199.7}, "CRYPTO": {...}}
+    prices = {category: {} for category in PRICED_CATEGORIES}
+    if stocks or cryptos:
+        finance_data = await get_finance_data(currencies=[], stocks=stocks, cryptos=cryptos)
+        prices["STOCK"] = {symbol: bars["close"][-1] for symbol, bars in finance_data["stock"].items() if bars["close"]}
+        prices["CRYPTO"] = {
+            symbol.removesuffix("-USD"): bars["close"][-1]
+            for symbol, bars in finance_data["crypto"].items()
+            if bars["close"]
+        }
+    return prices
+
+
 class AssetController:
 
-    def __init__(self, database_entity: MongoClient):
+    def __init__(self, database_entity: AsyncMongoClient):
         self._transaction_collection = database_entity['COMP4521']["assets"]
-        self.token_generator = JWTGenerator()
+        self._price_history = PriceHistoryStore(database_entity)
+        self._write_versions = UserWriteVersions(database_entity)
     
-    async def get_asset(self, token, target_currency):
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def get_currencies(self, user_id: str) -> list[str]:
+        # currencies held as plain amounts, i.e. what get_asset converts with the rate table
+        holdings = await self._transaction_collection.find({"user_id": user_id}, {"_id": 0, "category": 1, "type": 1}).to_list()
+        return sorted({asset["type"].upper() for asset in holdings if asset["category"].upper() not in PRICED_CATEGORIES})
 
-        assets = list(self._transaction_collection.find({"user_id": user_id}).sort("created_at", -1))
-        # print(f"token {token},  currency {currency}")
+    async def get_asset(self, user_id, target_currency, rates=None):
+        assets = await self._transaction_collection.find({"user_id": user_id}).sort("created_at", -1).to_list()
         
         hkt_tz = pytz.timezone('Asia/Hong_Kong')
-        usd_to_target_currency =  await currency_conversion("USD", target_currency.upper(), 1) 
+        target_currency = target_currency.upper()
+        if rates is not None:
+            usd_to_target_currency = rates.convert("USD", target_currency, 1)
+        else:
+            usd_to_target_currency = await currency_conversion("USD", target_currency, 1)
+
+        # resolve every held symbol in one lookup instead of one per asset
+        stocks = sorted({asset["type"].upper() for asset in assets if asset["category"].upper() == "STOCK"})
+        cryptos = sorted({asset["type"].upper() for asset in assets if asset["category"].upper() == "CRYPTO"})
+        prices = await get_asset_prices(stocks, cryptos)
+
+        # everything else is held as a plain currency amount
+        currency_assets = [asset for asset in assets if asset["category"].upper() not in prices]
+        converted_currency_amounts = await convert_many(
+            [asset["amount"] for asset in currency_assets],
+            [asset["type"] for asset in currency_assets],
+            target_currency,
+            rates,
+        )
+        for asset, converted_amount in zip(currency_assets, converted_currency_amounts):
+            asset["converted_amount"] = converted_amount
+
         for asset in assets:
 
             asset["id"] = str(asset["_id"])
@@ -32,29 +79,18 @@ class AssetController:
                 updated_at_utc = asset['updated_at']
                 asset['updated_at'] = updated_at_utc.replace(tzinfo=pytz.utc).astimezone(hkt_tz).strftime('%Y-%m-%d %H:%M:%S')
 
-            if asset['category'].upper() == 'CURRENCY':
-                asset["converted_amount"] = float(await currency_conversion(asset["type"].upper(), target_currency, asset["amount"]))
-            elif asset["category"].upper() == 'STOCK' :
-                result = await get_finance_data(stocks=[asset['type'].upper()])
-                result = result['stock'][asset['type']][0]["Close"] * int(asset["amount"]) * usd_to_target_currency
-                # print(result * usd_to_target_currency)
-                asset["converted_amount"] = float(result)
-                
-            elif asset["category"].upper() == "CRYPTO":
-                result = await get_finance_data(cryptos=[asset['type'].upper()])
-                # result
-                result = result['crypto'][asset['type'] + "-USD" ][0]["Close"] * int(asset["amount"]) * usd_to_target_currency
-                asset["converted_amount"] = float(result)
-            
-            else:
-                asset["converted_amount"] = float(await currency_conversion(asset["type"].upper(), target_currency, asset["amount"]))
+            category = asset["category"].upper()
+            if category in prices:
+                price = prices[category].get(asset["type"].upper())
+                asset["converted_amount"] = None if price is None else price * int(asset["amount"]) * usd_to_target_currency
+            if asset["converted_amount"] is not None:
+                asset["converted_amount"] = float(asset["converted_amount"])
+
             asset.pop("_id", None)
             asset.pop("user_id", None)
         return {"assets": assets}
     
-    async def add_asset(self, token, asset):
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def add_asset(self, user_id, asset):
 
         now = datetime.now(ZoneInfo("Asia/Hong_Kong"))
         asset_doc = {
@@ -66,12 +102,11 @@ class AssetController:
             "updated_at": now
         }
 
-        result = self._transaction_collection.insert_one(asset_doc)
+        result = await self._transaction_collection.insert_one(asset_doc)
+        await self._write_versions.bump(user_id, "asset")
         return {"status": 200, "id": str(result.inserted_id)}
     
-    async def modify_asset(self, token, new_asset):
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def modify_asset(self, user_id, new_asset):
         
         
         update_data= new_asset.dict(exclude_unset=True)
@@ -81,25 +116,77 @@ class AssetController:
 
         
 
-        result = self._transaction_collection.update_one(
+        result = await self._transaction_collection.update_one(
             {"_id": ObjectId(asset_id), "user_id": user_id},
             {"$set": update_data}
         )
 
         if result.matched_count == 0:
             return {"status": 400, "message": "Asset not found or unauthorized"}
+        await self._write_versions.bump(user_id, "asset")
         
         return {"status": 200, "message": "Asset updated successfully"}
     
-    async def del_asset(self, token, asset_id):
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def del_asset(self, user_id, asset_id):
 
-        result = self._transaction_collection.delete_one(
+        result = await self._transaction_collection.delete_one(
             {"_id": ObjectId(asset_id), "user_id": user_id}
         )
 
         if result.deleted_count == 0:
             return {"status": 200}
+        await self._write_versions.bump(user_id, "asset")
         
         return {"status": 200, "message": "Asset Deleted"}
+
+    async def _daily_closes(self, symbol: str, asset_class: str, dates: pd.DatetimeIndex) -> pd.Series:
+        # a week of lead-in so the first day has a close to carry forward over a weekend or holiday
+        history = await self._price_history.get_history(
+            symbol, asset_class, "1d", dates[0].to_pydatetime() - timedelta(days=7), dates[-1].to_pydatetime() + timedelta(days=1)
+        )
+        return daily_closes(history["bars"], dates)
+
+    async def get_net_worth_history(self, user_id, target_currency, start, end):
+        # daily value of the current holdings in target_currency; a holding counts from the day it was added
+        target_currency = target_currency.upper()
+        dates = pd.date_range(start, end, freq="D", tz="UTC")
+        assets = await self._transaction_collection.find(
+            {"user_id": user_id}, {"_id": 0, "category": 1, "type": 1, "amount": 1, "created_at": 1}
+        ).to_list()
+
+        holdings = pd.DataFrame(assets, columns=["category", "type", "amount", "created_at"])
+        holdings["category"] = holdings["category"].str.upper()
+        holdings["type"] = holdings["type"].str.upper()
+        holdings["amount"] = pd.to_numeric(holdings["amount"], errors="coerce").fillna(0.0)
+        holdings["created_at"] = pd.to_datetime(holdings["created_at"], utc=True).fillna(dates[0])
+
+        # one daily series per priced symbol and per currency, fetched concurrently from the history store
+        priced = holdings[holdings["category"].isin(PRICED_CATEGORIES)][["category", "type"]].drop_duplicates()
+        priced_keys = list(priced.itertuples(index=False, name=None))
+        currencies = sorted(set(holdings.loc[~holdings["category"].isin(PRICED_CATEGORIES), "type"]) | {target_currency})
+        currencies = [currency for currency in currencies if currency != BASE_CURRENCY]
+
+        series = await asyncio.gather(
+            *(self._daily_closes(symbol, category.lower(), dates) for category, symbol in priced_keys),
+            *(self._daily_closes(currency, "currency", dates) for currency in currencies),
+        )
+        prices = dict(zip(priced_keys, series[:len(priced_keys)]))
+        usd_rates = dict(zip(currencies, series[len(priced_keys):]))
+
+        if target_currency != BASE_CURRENCY and usd_rates[target_currency].isna().all():
+            # no rate history at all: an unknown currency, like /finance/USD{to_currency}
+            return {"status": 404, "error": "Currency Not Found"}
+
+        values = net_worth_frame(holdings, prices, usd_rates, target_currency, dates)
+
+        def _values(series: pd.Series) -> list:
+            # NaN (no target rate that day) goes out as null
+            return [None if value != value else value for value in series.round(6).tolist()]
+
+        return {
+            "status": 200,
+            "currency": target_currency,
+            "dates": dates.strftime("%Y-%m-%d").tolist(),
+            "net_worth": _values(values.sum(axis=1).mask(values.isna().any(axis=1))),
+            "categories": {category: _values(values[category]) for category in values.columns},
+        }
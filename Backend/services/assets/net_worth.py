@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+from ..finance.rate_table import BASE_CURRENCY
+
+
+def daily_closes(bars: dict, dates: pd.DatetimeIndex) -> pd.Series:
+    # columnar daily bars (ascending) -> the latest close on or before each date; days before the first bar take it
+    if not bars["timestamps"]:
+        return pd.Series(np.nan, index=dates)
+    # daily bars are stamped at the exchange's midnight (e.g. 05:00 or 23:00 UTC), round to the nearest day
+    days = (np.asarray(bars["timestamps"], dtype=np.int64) + 43200) // 86400 * 86400
+    closes = np.asarray(bars["close"], dtype=np.float64)
+    positions = np.searchsorted(days, dates.as_unit("s").asi8, side="right") - 1
+    return pd.Series(closes[positions.clip(min=0)], index=dates)
+
+
+def held_quantities(holdings: pd.DataFrame, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    # one column per (category, type): the quantity held on each day, counted from the day it was added
+    held_from = holdings["created_at"].dt.floor("D").clip(lower=dates[0])
+    additions = holdings.assign(held_from=held_from).pivot_table(
+        index="held_from", columns=["category", "type"], values="amount", aggfunc="sum"
+    )
+    return additions.reindex(dates, fill_value=0.0).fillna(0.0).cumsum()
+
+
+def net_worth_frame(
+    holdings: pd.DataFrame, prices: dict, usd_rates: dict, target_currency: str, dates: pd.DatetimeIndex
+) -> pd.DataFrame:
+    # holdings: category/type/amount/created_at rows; prices: (category, type) -> USD close series;
+    # usd_rates: currency -> units per USD series. Returns per-category values in target_currency by day,
+    # NaN on days without a target_currency rate.
+    if holdings.empty:
+        return pd.DataFrame(index=dates)
+    quantities = held_quantities(holdings, dates)
+
+    def units_per_usd(currency: str) -> pd.Series:
+        if currency == BASE_CURRENCY:
+            return pd.Series(1.0, index=dates)
+        return usd_rates.get(currency, pd.Series(np.nan, index=dates))
+
+    usd_per_unit = pd.concat(
+        [
+            prices[(category, symbol)] if (category, symbol) in prices else 1.0 / units_per_usd(symbol)
+            for category, symbol in quantities.columns
+        ],
+        axis=1,
+        keys=quantities.columns,
+    )
+
+    # a holding without a price on a day counts as 0 rather than poisoning the total
+    target_rates = units_per_usd(target_currency)
+    values = (quantities * usd_per_unit.fillna(0.0)).mul(target_rates.fillna(0.0), axis=0)
+    values = values.T.groupby(level="category").sum().T
+    # without a target rate there is no value at all, which is not the same as a value of 0
+    values.loc[target_rates.isna()] = np.nan
+    return values
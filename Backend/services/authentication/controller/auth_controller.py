@@ -1,11 +1,19 @@
+import logging
 from abc import ABC, abstractmethod
-from ..token.encryption import hash_password, verify_password
+from ..token.encryption import password_hasher, needs_rehash, PasswordHasherBusy
 from ..token.access_token import JWTGenerator
-from pymongo.mongo_client import MongoClient
+from pymongo import AsyncMongoClient
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# built by services.database.indexes; registration relies on it to reject duplicate usernames
+USERNAME_INDEX = "username_unique"
+
 class AuthController(ABC):
 
 
-    def __init__(self, database_entity:MongoClient) -> None:
+    def __init__(self, database_entity:AsyncMongoClient) -> None:
         super().__init__()
         self.token_generator = JWTGenerator()
         self._user_credential_collection = database_entity["COMP4521"]["credential"]
@@ -14,7 +22,7 @@ class AuthController(ABC):
 
 class LoginController(AuthController):
 
-    def __init__(self, database_entity: MongoClient) ->None:
+    def __init__(self, database_entity: AsyncMongoClient) ->None:
         super().__init__(database_entity)
         
 
@@ -35,7 +43,7 @@ class LoginController(AuthController):
         
         # check for username and password if token expired 
         try:
-            user_information = self._user_credential_collection.find_one({"username": username}) # need to chaneg to the db controller get function
+            user_information = await self._user_credential_collection.find_one({"username": username}) # need to chaneg to the db controller get function
            
         except Exception as e:
     
@@ -47,14 +55,25 @@ class LoginController(AuthController):
         try:         
             user_id = user_information.get('_id')
             hashed_password = user_information.get('password')
-            isPwdCorrect = verify_password(password, hashed_password)
+            isPwdCorrect = await password_hasher.verify(password, hashed_password)
             
+        except PasswordHasherBusy:
+            return {"status": 503, 'error': 'server busy, please retry'}
         except Exception as e:
 
             return {"status": 500, 'error': 'internal server error'}
 
         if not isPwdCorrect:
             return {'status':400, "error": 'Invalid Password'} 
+
+        # the cost setting changed since this hash was made, upgrade it while the plain password is at hand
+        if needs_rehash(hashed_password):
+            try:
+                await self._user_credential_collection.update_one(
+                    {"_id": user_id}, {"$set": {"password": await password_hasher.hash(password)}}
+                )
+            except Exception as e:
+                logger.warning("password rehash skipped", extra={"username": username, "error": str(e)})
         
         token_generator_payload = {
             'user_id': str(user_id),
@@ -73,6 +92,20 @@ class LoginController(AuthController):
 class RegisterController(AuthController):
     def __init__(self, database_entity) ->None:
         super().__init__(database_entity)
+        self._username_index_confirmed = False
+
+    async def _confirm_username_index(self) -> bool:
+        # checked until seen once: if the index build failed at startup, duplicates would go through
+        if not self._username_index_confirmed:
+            try:
+                indexes = await self._user_credential_collection.index_information()
+            except Exception:
+                logger.exception("could not read the credential indexes")
+                return False
+            self._username_index_confirmed = indexes.get(USERNAME_INDEX, {}).get("unique", False)
+            if not self._username_index_confirmed:
+                logger.error("registration refused, unique username index missing", extra={"index": USERNAME_INDEX})
+        return self._username_index_confirmed
 
 
     async def register_credential (self, request_entity: dict):
@@ -81,27 +114,26 @@ class RegisterController(AuthController):
 
         if not( username and password ): 
             return {'status': 400, 'error': 'must have username and password as input'}
-        
-        try:
-            isUserExist = self._user_credential_collection.find_one({"username": username}) # update to the find function for that db
-            if(isUserExist):
-                return {'status': 400, 'error':'username already exist'}
-
-        except Exception as e:
-            return {"status": 500, 'error': 'internal server error'}
-
 
+        if not await self._confirm_username_index():
+            return {"status": 503, 'error': 'registration unavailable, please retry later'}
         
-        hashed_password = hash_password(password)
+        try:
+            hashed_password = await password_hasher.hash(password)
+        except PasswordHasherBusy:
+            return {"status": 503, 'error': 'server busy, please retry'}
         try:
             user_information = {
                 "username": username,
                 "password": hashed_password
             }
-            user_inserted =self._user_credential_collection.insert_one(user_information) # update to the insert function for that db controller
+            # the unique username index rejects duplicates, so no separate existence check is needed
+            user_inserted = await self._user_credential_collection.insert_one(user_information) # update to the insert function for that db controller
             user_id = user_inserted.inserted_id
-        except Exception as e:
-            print(e)
+        except DuplicateKeyError:
+            return {'status': 400, 'error':'username already exist'}
+        except Exception:
+            logger.exception("registration failed")
             return {"status": 500, 'error': 'internal server error'}
         
         token_generator_payload = {
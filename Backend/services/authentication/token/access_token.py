@@ -1,14 +1,57 @@
 import jwt
+import logging
 import os
-from dotenv import load_dotenv
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 
 import jwt.exceptions
+from services.monitoring.metrics import CACHE_LOOKUPS
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "1024"))
+
+logger = logging.getLogger(__name__)
+
+
+class VerifiedTokenCache:
+    # token -> decoded claims, least recently used first; an entry lives until the token's exp
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE) -> None:
+        self._max_size = max_size
+        self._claims = OrderedDict()
+
+    def get(self, token: str) -> dict | None:
+        claims = self._claims.get(token)
+        if claims is None:
+            return None
+        if claims.get("exp", 0) <= time.time():
+            del self._claims[token]
+            return None
+        self._claims.move_to_end(token)
+        return claims
+
+    def put(self, token: str, claims: dict) -> None:
+        # tokens without an exp are never cached, they would otherwise stay valid forever
+        if self._max_size <= 0 or "exp" not in claims:
+            return
+        self._claims[token] = claims
+        self._claims.move_to_end(token)
+        while len(self._claims) > self._max_size:
+            self._claims.popitem(last=False)
+
+    def clear(self) -> None:
+        self._claims.clear()
+
+    def __len__(self) -> int:
+        return len(self._claims)
+
+
+# shared by every JWTGenerator so a token is decoded once no matter which controller sees it
+verified_tokens = VerifiedTokenCache()
 
 
 class JWTGenerator:
     def __init__ (self) -> None:
-        load_dotenv()
+        # the environment is loaded once at startup (main.py), not per instance
         self._secret_key = os.getenv('JWT_SECRET_KEY')
         self._algorithm =  os.getenv('JWT_ALGORITHM')
 
@@ -21,19 +64,25 @@ class JWTGenerator:
         return token
 
     def verify_jwt_token(self, token: str):
+        cached = verified_tokens.get(token)
+        if cached is not None:
+            CACHE_LOOKUPS.labels("token", "hit").inc()
+            return dict(cached)
+        CACHE_LOOKUPS.labels("token", "miss").inc()
         try: 
             decoded = jwt.decode(token, self._secret_key,self._algorithm)
-            return decoded
+            verified_tokens.put(token, decoded)
+            return dict(decoded)
         
         except jwt.exceptions.ExpiredSignatureError:
-            print("Token has expired")
+            logger.info("token expired")
             return False
         
         except jwt.exceptions.InvalidTokenError:
-            print("'Invalid token'")
+            logger.info("invalid token")
             return False
         
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.exception("token verification failed")
             return False
             
\ No newline at end of file
@@ -1,9 +1,111 @@
+import asyncio
+import functools
+import os
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from services.monitoring.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_QUEUE, PASSWORD_HASH_REJECTED
 
-def hash_password(password: str) -> bytes:
-    salt = bcrypt.gensalt()
+# bcrypt work factor for new hashes; existing hashes with another cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# logins waiting for a worker beyond this are turned away instead of piling up
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def hash_password(password: str, rounds: int = None) -> bytes:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 def verify_password(password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
 
+def hash_rounds(hashed_password: bytes) -> int:
+    # "$2b$12$<salt+hash>" -> 12
+    if isinstance(hashed_password, str):
+        hashed_password = hashed_password.encode()
+    return int(hashed_password.split(b"$")[2])
+
+def needs_rehash(hashed_password: bytes, rounds: int = None) -> bool:
+    return hash_rounds(hashed_password) != (rounds or BCRYPT_ROUNDS)
+
+
+def _timed(operation: str, func, *args):
+    # runs on the bcrypt pool, so only the hashing itself is timed
+    with PASSWORD_HASH_DURATION.labels(operation).time():
+        return func(*args)
+
+
+class PasswordHasher:
+    # runs bcrypt off the event loop on a small dedicated pool, at most `workers` at a time
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE) -> None:
+        self._workers = workers
+        self._max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = None
+        self._slots_loop = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # one semaphore per event loop, asyncio primitives cannot be shared across loops
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self._workers)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _run(self, func, *args):
+        if self.waiting >= self._max_queue:
+            self.rejected += 1
+            PASSWORD_HASH_REJECTED.inc()
+            raise PasswordHasherBusy(f"{self.waiting} password hashes already waiting")
+
+        slots = self._semaphore()
+        if slots.locked():
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            PASSWORD_HASH_QUEUE.labels("waiting").inc()
+            try:
+                await slots.acquire()
+            finally:
+                self.waiting -= 1
+                PASSWORD_HASH_QUEUE.labels("waiting").dec()
+        else:
+            await slots.acquire()
+
+        self.in_flight += 1
+        PASSWORD_HASH_QUEUE.labels("in_flight").inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            self.in_flight -= 1
+            PASSWORD_HASH_QUEUE.labels("in_flight").dec()
+            self.completed += 1
+            slots.release()
+
+    async def hash(self, password: str) -> bytes:
+        return await self._run(_timed, "hash", hash_password, password)
+
+    async def verify(self, password: str, hashed_password: bytes) -> bool:
+        return await self._run(_timed, "verify", verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self._workers,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure, CollectionInvalid
+from services.finance.price_history import (
+    PRICE_HISTORY_COLLECTION, PRICE_COVERAGE_COLLECTION, PRICE_HISTORY_TIMESERIES
+)
+
+DATABASE_NAME = "COMP4521"
+
+logger = logging.getLogger(__name__)
+
+# collections that must exist with special options before their indexes are built
+TIMESERIES_COLLECTIONS = {
+    PRICE_HISTORY_COLLECTION: PRICE_HISTORY_TIMESERIES,
+}
+
+# collection -> [(index, queries it covers)]
+INDEXES = {
+    "credential": [
+        (
+            IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+            "find_one({username}) in LoginController, duplicate check in RegisterController.insert_one",
+        ),
+    ],
+    "transaction": [
+        (
+            IndexModel(
+                [("user_id", ASCENDING), ("datetime", DESCENDING), ("_id", DESCENDING)], name="user_id_datetime_id"
+            ),
+            "keyset pages find({user_id, datetime/_id < after}).sort(datetime, -1, _id, -1) "
+            "in TransactionController.get_transactions_by_user/stream_transactions, "
+            "{user_id, datetime >= period start} inside the $lookup of TargetController.get_target_progress",
+        ),
+    ],
+    "transaction_rollup": [
+        (
+            IndexModel(
+                [("user_id", ASCENDING), ("currency_type", ASCENDING), ("month", ASCENDING)],
+                name="user_id_currency_type_month_unique",
+                unique=True,
+            ),
+            "$inc upserts in TransactionRollup.apply/apply_many, "
+            "find({user_id, month}) in TransactionRollup.get_rollups",
+        ),
+    ],
+    "transaction_rollup_stale": [
+        (
+            IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+            "upsert in TransactionRollup.mark_stale, find_one_and_delete({user_id}) in TransactionRollup.get_rollups",
+        ),
+    ],
+    "assets": [
+        (
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+            "find({user_id}).sort(created_at, -1) in AssetController.get_asset",
+        ),
+        (
+            IndexModel([("category", ASCENDING), ("type", ASCENDING)], name="category_type"),
+            "distinct(type, {category}) in MarketDataPrefetcher.watchlist",
+        ),
+    ],
+    PRICE_HISTORY_COLLECTION: [
+        (
+            IndexModel(
+                [("meta.symbol", ASCENDING), ("meta.interval", ASCENDING), ("timestamp", ASCENDING)],
+                name="symbol_interval_timestamp",
+            ),
+            "range reads in PriceHistoryStore.get_history, the newest fetch of a bar wins",
+        ),
+    ],
+    PRICE_COVERAGE_COLLECTION: [
+        (
+            IndexModel([("symbol", ASCENDING), ("interval", ASCENDING)], name="symbol_interval_unique", unique=True),
+            "find_one/update_one({symbol, interval}) in PriceHistoryStore.ensure_range",
+        ),
+    ],
+    "target": [
+        (
+            IndexModel(
+                [("user_id", ASCENDING), ("target_type", ASCENDING)], name="user_id_target_type_unique", unique=True
+            ),
+            "replace_one({user_id, target_type}, upsert) in TargetController.insert_target, "
+            "find({user_id}) and delete_many({user_id}) via the user_id prefix",
+        ),
+    ],
+}
+
+# collection -> index names an entry in INDEXES replaced, dropped once their replacement exists
+SUPERSEDED_INDEXES = {
+    "transaction": ["user_id_datetime"],
+}
+
+
+async def drop_superseded_indexes(database: AsyncDatabase, collection_name: str) -> list:
+    dropped = []
+    for name in SUPERSEDED_INDEXES.get(collection_name, []):
+        try:
+            await database[collection_name].drop_index(name)
+        except OperationFailure as e:
+            # IndexNotFound: never built here, or already dropped by another instance
+            if e.code != 27:
+                logger.warning(
+                    "could not drop index", extra={"collection": collection_name, "index": name, "error": str(e)}
+                )
+            continue
+        logger.info("dropped superseded index", extra={"collection": collection_name, "index": name})
+        dropped.append(name)
+    return dropped
+
+
+async def ensure_collections(database: AsyncDatabase) -> None:
+    existing = set(await database.list_collection_names())
+    for collection_name, timeseries in TIMESERIES_COLLECTIONS.items():
+        if collection_name in existing:
+            continue
+        try:
+            await database.create_collection(collection_name, timeseries=timeseries)
+            logger.info("created time-series collection", extra={"collection": collection_name})
+        except (CollectionInvalid, OperationFailure) as e:
+            # another instance created it first, or the server predates time-series collections
+            logger.warning("could not create collection", extra={"collection": collection_name, "error": str(e)})
+
+
+async def ensure_indexes(database: AsyncDatabase) -> dict:
+    # create_indexes is a no-op for indexes that already exist, so this is safe on every startup
+    await ensure_collections(database)
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        try:
+            names = await database[collection_name].create_indexes([index for index, _ in indexes])
+        except OperationFailure as e:
+            # e.g. existing duplicate usernames block the unique index until they are cleaned up
+            logger.error("failed to create indexes", extra={"collection": collection_name, "error": str(e)})
+            report[collection_name] = {"error": str(e)}
+            continue
+
+        report[collection_name] = {name: covers for name, (_, covers) in zip(names, indexes)}
+        for name, covers in report[collection_name].items():
+            logger.info("index ready", extra={"collection": collection_name, "index": name, "covers": covers})
+        # only after the replacement is built, so the queries it served are never left without an index
+        await drop_superseded_indexes(database, collection_name)
+    return report
+
+
+if __name__ == "__main__":
+    # standalone bootstrap: python -m services.database.indexes
+    from dotenv import load_dotenv
+    from services.database.mongo_client import create_mongo_client
+
+    async def _bootstrap():
+        load_dotenv()
+        client = create_mongo_client(os.getenv("MONGO_URL"))
+        try:
+            await ensure_indexes(client[DATABASE_NAME])
+        finally:
+            await client.close()
+
+    asyncio.run(_bootstrap())
@@ -0,0 +1,21 @@
+import os
+from pymongo import AsyncMongoClient
+from pymongo.server_api import ServerApi
+from services.monitoring.metrics import MongoCommandMetrics
+
+
+def create_mongo_client(mongo_url: str) -> AsyncMongoClient:
+    # pool and timeout settings come from the environment so each deployment can tune them
+    return AsyncMongoClient(
+        mongo_url,
+        server_api=ServerApi('1'),
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        maxIdleTimeMS=int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        waitQueueTimeoutMS=int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),
+        connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+        socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+        serverSelectionTimeoutMS=int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+        readPreference=os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        event_listeners=[MongoCommandMetrics()],
+    )
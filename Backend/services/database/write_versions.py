@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+from pymongo import AsyncMongoClient
+
+WRITE_VERSION_COLLECTION = "user_write_version"
+# what a per-user read can depend on, each bumped by its controller's writes
+WRITE_RESOURCES = ("transaction", "asset", "target")
+
+
+def _utc(moment: datetime) -> datetime:
+    # Mongo hands datetimes back naive (UTC)
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+class UserWriteVersions:
+    # one document per user, e.g. {_id: user_id, transaction: {version: 3, modified_at: ...}, asset: {...}}
+    # kept in Mongo rather than in memory so every worker sees the same versions
+
+    def __init__(self, database_entity: AsyncMongoClient) -> None:
+        self._version_collection = database_entity["COMP4521"][WRITE_VERSION_COLLECTION]
+
+    async def bump(self, user_id: str, resource: str) -> None:
+        await self._version_collection.update_one(
+            {"_id": user_id},
+            {"$inc": {f"{resource}.version": 1}, "$set": {f"{resource}.modified_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+    async def get(self, user_id: str, resources: tuple = WRITE_RESOURCES) -> tuple[tuple, datetime | None]:
+        # (version per resource, newest write among them); a user who never wrote is at version 0
+        document = await self._version_collection.find_one({"_id": user_id}) or {}
+        versions = tuple(document.get(resource, {}).get("version", 0) for resource in resources)
+        modified = [_utc(document[resource]["modified_at"]) for resource in resources if resource in document]
+        return versions, max(modified, default=None)
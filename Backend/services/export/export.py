@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from pymongo import AsyncMongoClient, DESCENDING
+from ..finance.currency_conversion import get_rate_snapshot
+from ..assets.asset import get_asset_prices, PRICED_CATEGORIES
+from ..transaction.transaction import TRANSACTION_SORT
+
+EXPORT_RESOURCES = ("transactions", "assets")
+EXPORT_FORMATS = ("csv", "ndjson")
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_COLUMNS = {
+    "transactions": ["transaction_id", "date", "type", "category_type", "currency_type", "amount", "created_at"],
+    "assets": ["id", "category", "type", "amount", "created_at", "updated_at"],
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class ExportController:
+
+    def __init__(self, database_entity: AsyncMongoClient) -> None:
+        self._transaction_collection = database_entity["COMP4521"]["transaction"]
+        self._asset_collection = database_entity["COMP4521"]["assets"]
+
+    async def _held_symbols(self, user_id: str, category: str) -> list:
+        held = await self._asset_collection.distinct(
+            "type", {"user_id": user_id, "category": {"$regex": f"^{category}$", "$options": "i"}}
+        )
+        return sorted({symbol.upper() for symbol in held})
+
+    async def _transaction_rows(self, user_id: str, target_currency: str = None):
+        rates = None
+        if target_currency:
+            # every currency the user has, so the snapshot covers each row whatever the table held before
+            currencies = await self._transaction_collection.distinct("currency_type", {"user_id": user_id})
+            rates = await get_rate_snapshot([*currencies, target_currency])
+        cursor = self._transaction_collection.find({"user_id": user_id}).sort(TRANSACTION_SORT)
+        async for transaction in cursor.batch_size(EXPORT_BATCH_SIZE):
+            row = {
+                "transaction_id": str(transaction["_id"]),
+                **{column: _isoformat(transaction.get(column)) for column in EXPORT_COLUMNS["transactions"][1:]},
+            }
+            if rates:
+                row["converted_amount"] = rates.convert(transaction["currency_type"], target_currency, transaction["amount"])
+                row["converted_currency"] = target_currency
+            yield row
+
+    async def _asset_rows(self, user_id: str, target_currency: str = None):
+        rates, prices = None, None
+        if target_currency:
+            # prices and rates are captured once so every row is valued at the same moment
+            rates = await get_rate_snapshot([*await self._held_symbols(user_id, "currency"), "USD", target_currency])
+            prices = await get_asset_prices(
+                await self._held_symbols(user_id, "stock"), await self._held_symbols(user_id, "crypto")
+            )
+
+        cursor = self._asset_collection.find({"user_id": user_id}).sort("created_at", DESCENDING)
+        async for asset in cursor.batch_size(EXPORT_BATCH_SIZE):
+            row = {
+                "id": str(asset["_id"]),
+                **{column: _isoformat(asset.get(column)) for column in EXPORT_COLUMNS["assets"][1:]},
+            }
+            if rates:
+                category = asset["category"].upper()
+                if category in PRICED_CATEGORIES:
+                    price = prices[category].get(asset["type"].upper())
+                    usd_amount = None if price is None else price * int(asset["amount"])
+                    row["converted_amount"] = rates.convert("USD", target_currency, usd_amount) if usd_amount is not None else None
+                else:
+                    row["converted_amount"] = rates.convert(asset["type"], target_currency, asset["amount"])
+                row["converted_currency"] = target_currency
+            yield row
+
+    async def _lines(self, rows, columns: list, export_format: str):
+        if export_format == "ndjson":
+            async for row in rows:
+                yield json.dumps(row) + "\n"
+            return
+
+        line = io.StringIO()
+        writer = csv.DictWriter(line, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+        async for row in rows:
+            writer.writerow(row)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+
+    def export(self, user_id: str, resource: str, export_format: str, target_currency: str = None):
+        # the lines come straight off the Mongo cursor
+        target_currency = target_currency.upper() if target_currency else None
+
+        if resource == "transactions":
+            rows = self._transaction_rows(user_id, target_currency)
+        else:
+            rows = self._asset_rows(user_id, target_currency)
+        columns = EXPORT_COLUMNS[resource] + (["converted_amount", "converted_currency"] if target_currency else [])
+        return self._lines(rows, columns, export_format)
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from pymongo import UpdateOne
+
+try:
+    import fcntl
+except ImportError:  # Windows: the file backend runs without the cross-process lock
+    fcntl = None
+
+ASSET_CLASSES = ("currency", "stock", "crypto")
+
+# FINANCE_CACHE_BACKEND picks where the market data cache lives; file is per host, mongo and redis are shared
+CACHE_BACKENDS = ("memory", "file", "mongo", "redis")
+DEFAULT_CACHE_PATH = os.path.join("finance_data_cache", "data.json")
+MONGO_CACHE_COLLECTION = "market_cache"
+REDIS_CACHE_KEY = "market_cache"
+
+
+def empty_document() -> dict:
+    # the shape every backend loads into: entries per asset class, their retrieval times, and the newest of those
+    return {
+        "timeRetrieved": None,
+        **{asset_class: {} for asset_class in ASSET_CLASSES},
+        "retrieved": {asset_class: {} for asset_class in ASSET_CLASSES},
+    }
+
+
+def newest(*times: str | None) -> str | None:
+    return max((t for t in times if t is not None), key=datetime.fromisoformat, default=None)
+
+
+def _entry_key(asset_class: str, symbol: str) -> str:
+    return f"{asset_class}:{symbol}"
+
+
+def _entry_keys(symbols: dict) -> list[str]:
+    return [_entry_key(asset_class, symbol) for asset_class, requested in symbols.items() for symbol in requested]
+
+
+class MarketCacheBackend(ABC):
+    # storage behind MarketDataCache; time_retrieved values are ISO strings
+
+    @abstractmethod
+    async def load(self, symbols: dict | None = None) -> dict:
+        # the stored document, or only the requested symbols ({"stock": ["AAPL"]}) where the backend can
+        ...
+
+    @abstractmethod
+    async def store(self, entries: dict, time_retrieved: str) -> None:
+        # write entries per asset class ({"stock": {"AAPL": bars}}) without dropping symbols others stored
+        ...
+
+
+class MemoryCacheBackend(MarketCacheBackend):
+    # one process only, nothing survives a restart
+
+    def __init__(self) -> None:
+        self._document = empty_document()
+
+    async def load(self, symbols: dict | None = None) -> dict:
+        return {
+            "timeRetrieved": self._document["timeRetrieved"],
+            **{asset_class: dict(self._document[asset_class]) for asset_class in ASSET_CLASSES},
+            "retrieved": {asset_class: dict(self._document["retrieved"][asset_class]) for asset_class in ASSET_CLASSES},
+        }
+
+    async def store(self, entries: dict, time_retrieved: str) -> None:
+        for asset_class, symbols in entries.items():
+            self._document[asset_class].update(symbols)
+            self._document["retrieved"][asset_class].update({symbol: time_retrieved for symbol in symbols})
+        self._document["timeRetrieved"] = newest(self._document["timeRetrieved"], time_retrieved)
+
+
+class FileCacheBackend(MarketCacheBackend):
+    # one JSON file, shared by the workers of one host
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH) -> None:
+        self._path = path
+
+    def _read(self) -> dict:
+        try:
+            with open(self._path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return empty_document()
+
+        # caches written before per-symbol timestamps share the file's timeRetrieved
+        if "retrieved" not in data:
+            data["retrieved"] = {
+                asset_class: {symbol: data["timeRetrieved"] for symbol in data.get(asset_class, {})}
+                for asset_class in ASSET_CLASSES
+            }
+        for asset_class in ASSET_CLASSES:
+            data.setdefault(asset_class, {})
+            data["retrieved"].setdefault(asset_class, {})
+        return data
+
+    @contextmanager
+    def _locked(self, folder: str):
+        # serializes read-merge-write between processes so one worker's merge does not drop another's
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(folder, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _write(self, data: dict, folder: str) -> None:
+        # write to a temp file and rename over the cache, readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self._path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    async def load(self, symbols: dict | None = None) -> dict:
+        # file I/O (and the lock wait in store) runs off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._read)
+
+    async def store(self, entries: dict, time_retrieved: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._store, entries, time_retrieved)
+
+    def _store(self, entries: dict, time_retrieved: str) -> None:
+        folder = os.path.dirname(self._path) or "."
+        os.makedirs(folder, exist_ok=True)
+        with self._locked(folder):
+            data = self._read()
+            for asset_class, symbols in entries.items():
+                data[asset_class].update(symbols)
+                data["retrieved"][asset_class].update({symbol: time_retrieved for symbol in symbols})
+            data["timeRetrieved"] = newest(data["timeRetrieved"], time_retrieved)
+            self._write(data, folder)
+
+
+class MongoCacheBackend(MarketCacheBackend):
+    # one document per symbol, {_id: "stock:AAPL", asset_class, symbol, data, retrieved}, shared by every worker.
+    # per-symbol upserts mean concurrent writers never overwrite each other's symbols
+
+    META_ID = "_meta"
+
+    def __init__(self, collection) -> None:
+        self._collection = collection
+
+    async def load(self, symbols: dict | None = None) -> dict:
+        query = {} if symbols is None else {"_id": {"$in": [self.META_ID, *_entry_keys(symbols)]}}
+        document = empty_document()
+        async for entry in self._collection.find(query):
+            if entry["_id"] == self.META_ID:
+                document["timeRetrieved"] = entry.get("timeRetrieved")
+                continue
+            document[entry["asset_class"]][entry["symbol"]] = entry["data"]
+            document["retrieved"][entry["asset_class"]][entry["symbol"]] = entry["retrieved"]
+        return document
+
+    async def store(self, entries: dict, time_retrieved: str) -> None:
+        operations = [
+            UpdateOne(
+                {"_id": _entry_key(asset_class, symbol)},
+                {"$set": {"asset_class": asset_class, "symbol": symbol, "data": data, "retrieved": time_retrieved}},
+                upsert=True,
+            )
+            for asset_class, symbols in entries.items()
+            for symbol, data in symbols.items()
+        ]
+        # ISO strings in one format compare in time order, so $max keeps the newest
+        operations.append(UpdateOne({"_id": self.META_ID}, {"$max": {"timeRetrieved": time_retrieved}}, upsert=True))
+        await self._collection.bulk_write(operations, ordered=False)
+
+
+class RedisCacheBackend(MarketCacheBackend):
+    # one hash, field "stock:AAPL" -> JSON {"data", "retrieved"}; any client with async eval/hgetall/hmget works
+    # (redis.asyncio, or a Redis-compatible server such as Valkey or KeyDB)
+
+    TIME_FIELD = "timeRetrieved"
+    # ARGV: time field, time_retrieved, then field/value pairs. the entries and a newer timeRetrieved are written
+    # in one atomic step, ISO strings in one format compare in time order (like $max in MongoCacheBackend)
+    STORE_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if not current or current < ARGV[2] then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+"""
+
+    def __init__(self, client, key: str = REDIS_CACHE_KEY) -> None:
+        self._client = client
+        self._key = key
+
+    @staticmethod
+    def _text(value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def load(self, symbols: dict | None = None) -> dict:
+        if symbols is None:
+            fields = {self._text(field): value for field, value in (await self._client.hgetall(self._key)).items()}
+        else:
+            names = [self.TIME_FIELD, *_entry_keys(symbols)]
+            fields = dict(zip(names, await self._client.hmget(self._key, names)))
+
+        document = empty_document()
+        for field, value in fields.items():
+            if value is None:
+                continue
+            if field == self.TIME_FIELD:
+                document["timeRetrieved"] = self._text(value)
+                continue
+            asset_class, symbol = field.split(":", 1)
+            entry = json.loads(value)
+            document[asset_class][symbol] = entry["data"]
+            document["retrieved"][asset_class][symbol] = entry["retrieved"]
+        return document
+
+    async def store(self, entries: dict, time_retrieved: str) -> None:
+        # HSET replaces only the given fields, concurrent writers never drop each other's symbols
+        pairs = [
+            value
+            for asset_class, symbols in entries.items()
+            for symbol, data in symbols.items()
+            for value in (_entry_key(asset_class, symbol), json.dumps({"data": data, "retrieved": time_retrieved}))
+        ]
+        await self._client.eval(self.STORE_SCRIPT, 1, self._key, self.TIME_FIELD, time_retrieved, *pairs)
+
+
+def create_cache_backend(name: str = None) -> MarketCacheBackend:
+    # configured from the environment, e.g. FINANCE_CACHE_BACKEND=redis FINANCE_CACHE_REDIS_URL=redis://cache:6379/0
+    name = (name or os.getenv("FINANCE_CACHE_BACKEND", "file")).lower()
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "file":
+        return FileCacheBackend(os.getenv("FINANCE_CACHE_PATH", DEFAULT_CACHE_PATH))
+    if name == "mongo":
+        from services.database.mongo_client import create_mongo_client
+
+        client = create_mongo_client(os.getenv("FINANCE_CACHE_MONGO_URL", os.getenv("MONGO_URL")))
+        return MongoCacheBackend(client["COMP4521"][os.getenv("FINANCE_CACHE_COLLECTION", MONGO_CACHE_COLLECTION)])
+    if name == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("FINANCE_CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+
+        client = redis.from_url(os.getenv("FINANCE_CACHE_REDIS_URL", "redis://localhost:6379/0"))
+        return RedisCacheBackend(client, os.getenv("FINANCE_CACHE_REDIS_KEY", REDIS_CACHE_KEY))
+    raise ValueError(f"unknown FINANCE_CACHE_BACKEND {name!r}, expected one of {', '.join(CACHE_BACKENDS)}")
@@ -1,4 +1,18 @@
-from services.finance.finance_data_scraper import get_finance_data
+from services.finance.finance_data_scraper import get_finance_data, DEFAULT_CURRENCIES
+from services.finance.rate_table import rate_table
+
+
+async def _ensure_rate_table(currencies: list[str]) -> None:
+    # only touch the cache file / yfinance when the in-memory table is stale or lacks a currency
+    known_currencies = rate_table.currencies()
+    missing_currencies = {currency.upper() for currency in currencies} - known_currencies
+    if not rate_table.is_fresh() or missing_currencies:
+        # only currencies are needed here, the cache refetches just the stale ones
+        await get_finance_data(
+            currencies=sorted(set(DEFAULT_CURRENCIES) | known_currencies | missing_currencies),
+            stocks=[],
+            cryptos=[],
+        )
 
 
 async def currency_conversion(from_currency: str, to_currency: str, amount: float) -> float:
@@ -8,35 +22,33 @@ async def currency_conversion(from_currency: str, to_currency: str, amount: floa
 
     if from_currency == to_currency:
         return amount
-    
-    # get currency rate
-    finance_data = await get_finance_data()
-    conversion_rates = finance_data["currency"]
 
-    # check if conversion rate exists
-    if f"{from_currency}{to_currency}=X" not in conversion_rates:
-        return None
-    
-    # convert amount to target currency
-    conversion_rate = conversion_rates[f"{from_currency}{to_currency}=X"]   
-    converted_amount = amount * conversion_rate
+    # convert amount to target currency, None if the rate does not exist
+    await _ensure_rate_table([from_currency, to_currency])
+    return rate_table.convert(from_currency, to_currency, amount)
+
+
+async def convert_many(amounts: list[float], from_currencies: list[str], to_currency: str, rates=None) -> list[float]:
+    # rates: a RateTable snapshot shared by several conversions, used as is
+    if rates is not None:
+        return rates.convert_many(amounts, from_currencies, to_currency)
+    await _ensure_rate_table([*from_currencies, to_currency])
+    return rate_table.convert_many(amounts, from_currencies, to_currency)
+
 
-    return converted_amount
+async def get_rate_snapshot(currencies: list[str]):
+    await _ensure_rate_table(currencies)
+    return rate_table.snapshot()
 
 
-async def items_currency_conversion(items: list[dict], to_currency: str) -> list[dict]:
-    # get currency rate
-    finance_data = await get_finance_data()
-    conversion_rates = finance_data["currency"]
+async def items_currency_conversion(items: list[dict], to_currency: str, rates=None) -> list[dict]:
+    converted_amounts = await convert_many(
+        [item["amount"] for item in items], [item["currency"] for item in items], to_currency, rates
+    )
 
     # append converted amount to each item
-    for item in items:
-        if item["currency"] != to_currency:
-            # convert amount to target currency
-            conversion_rate = conversion_rates[f"{item['currency'].upper()}{to_currency.upper()}=X"]
-            item["converted_amount"] = item["amount"] * conversion_rate
-        else:
-            item["converted_amount"] = item["amount"]
+    for item, converted_amount in zip(items, converted_amounts):
+        item["converted_amount"] = converted_amount
         item["converted_currency"] = to_currency
 
     return items
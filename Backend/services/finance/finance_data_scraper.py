@@ -1,135 +1,244 @@
 import asyncio
+import functools
+import logging
 import os
-import json
 import yfinance as yf
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from services.finance.rate_table import rate_table, base_ticker, BASE_CURRENCY
+from services.finance.market_cache import MarketDataCache, CACHE_TTLS
+from services.finance.cache_backends import create_cache_backend
+from services.finance.ohlcv import frame_to_columns, format_bars
+from services.monitoring.metrics import CACHE_LOOKUPS, YFINANCE_FETCH_DURATION, YFINANCE_FETCH_FAILURES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURRENCIES = ["CNY", "HKD", "JPY", "USD"]
+DEFAULT_STOCKS = ["AAPL", "AMZN", "GOOG", "NVDA"]
+DEFAULT_CRYPTOS = ["BTC", "DOGE", "ETH", "USDT"]
+
+# yfinance calls block, so they run on a bounded pool instead of the event loop
+FETCH_WORKERS = int(os.getenv("FINANCE_FETCH_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.getenv("FINANCE_FETCH_TIMEOUT", "10"))
+_fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="yfinance")
+
+
+async def _run_blocking(func, *args, **kwargs):
+    # the timeout starts when a worker picks the call up, time spent queued behind a full pool does not count.
+    # a timed out call stops being awaited, its worker frees up once the yfinance request timeout hits
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+
+    def run():
+        loop.call_soon_threadsafe(started.set)
+        return func(*args, **kwargs)
+
+    future = loop.run_in_executor(_fetch_executor, run)
+    try:
+        await started.wait()
+    except asyncio.CancelledError:
+        # still queued, so it never runs
+        future.cancel()
+        raise
+    return await asyncio.wait_for(future, timeout=FETCH_TIMEOUT)
 
 
 # Singular batch get
 async def _get_yahoo_stock_data(symbol: str):
     try:
         ticker = yf.Ticker(symbol)
-        data = ticker.history(period="1d", interval="1m")
+        with YFINANCE_FETCH_DURATION.labels("quote").time():
+            data = await _run_blocking(ticker.history, period="1d", interval="1m", timeout=FETCH_TIMEOUT)
         return data
+    except asyncio.TimeoutError:
+        YFINANCE_FETCH_FAILURES.labels("quote", "timeout").inc()
+        logger.warning("timed out fetching data", extra={"symbol": symbol})
+        return None
     except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
+        YFINANCE_FETCH_FAILURES.labels("quote", "error").inc()
+        logger.warning("error fetching data", extra={"symbol": symbol, "error": str(e)})
         return None
 
 
 # Concurrent batch get
 async def _get_batch_yahoo_stock_data(symbols: list):
+    # the whole intraday history per symbol, as columnar bars. a failed or empty fetch is left out,
+    # so it is not cached as fresh data and the next request fetches the symbol again
     tasks = [_get_yahoo_stock_data(symbol) for symbol in symbols]
     stock_results = await asyncio.gather(*tasks)
-    labeled_results = {symbol: stock for symbol, stock in zip(symbols, stock_results)}
-
-    final_results = {symbol: [] for symbol in symbols}
-    for symbol, stock_data in labeled_results.items():
-        if stock_data is not None:
-            symbol_data = []
-            for index, row in stock_data.iterrows():
-                symbol_data.append(
-                    {
-                        "Date": str(index),
-                        "Open": float(row["Open"]),
-                        "High": float(row["High"]),
-                        "Low": float(row["Low"]),
-                        "Close": float(row["Close"]),
-                        "Volume": float(row["Volume"]),
-                    }
-                )
-                break
-            final_results[symbol] = symbol_data
-    return final_results
+    return {
+        symbol: frame_to_columns(stock_data)
+        for symbol, stock_data in zip(symbols, stock_results)
+        if stock_data is not None and not stock_data.empty
+    }
 
 
 async def _get_yahoo_currency_rate(currencies: list = None):
     # default currencies to CNY, HKD, JPY, USD if not provided
     if currencies is None:
-        currencies = ["CNY", "HKD", "JPY", "USD"]
+        currencies = DEFAULT_CURRENCIES
 
+    # one ticker per currency against the base, cross rates are derived by the rate table
     tickers = [
-        f"{from_currency.upper()}{to_currency.upper()}=X"
-        for from_currency in currencies
-        for to_currency in currencies
-        if from_currency != to_currency
+        base_ticker(currency)
+        for currency in currencies
+        if currency.upper() != BASE_CURRENCY
     ]
+    if not tickers:
+        return {}
 
     try:
-        df = yf.download(tickers, period="1d", interval="1d")
+        with YFINANCE_FETCH_DURATION.labels("currency").time():
+            df = await _run_blocking(
+                yf.download, tickers, period="1d", interval="1d", progress=False, timeout=FETCH_TIMEOUT
+            )
         if df.empty:
             raise ValueError("No data returned for the given currencies.")
 
         conversion_rates = {}
         for ticker in tickers:
-            conversion_rates[ticker] = df.iloc[0, df.columns.get_loc(("Close", ticker))]
+            rate = df.iloc[0, df.columns.get_loc(("Close", ticker))]
+            # skip tickers yfinance could not resolve (NaN)
+            if rate == rate:
+                conversion_rates[ticker] = float(rate)
 
         return conversion_rates
 
+    except asyncio.TimeoutError:
+        YFINANCE_FETCH_FAILURES.labels("currency", "timeout").inc()
+        logger.warning("timed out fetching currencies", extra={"currencies": currencies})
+        return None
     except Exception as e:
-        print(f"Error fetching data for currencies {currencies}: {e}")
+        YFINANCE_FETCH_FAILURES.labels("currency", "error").inc()
+        logger.warning("error fetching currencies", extra={"currencies": currencies, "error": str(e)})
         return None
 
 
+# file backend by default; FINANCE_CACHE_BACKEND=mongo|redis shares one warm cache across workers and containers
+market_cache = MarketDataCache(create_cache_backend())
+
+# refreshes currently talking to yfinance, keyed by the requested symbol set
+_inflight_refreshes: dict[tuple, asyncio.Task] = {}
+
+
+def _load_rate_table() -> None:
+    rates = {
+        ticker: rate
+        for ticker, rate in market_cache.entries("currency").items()
+        if ticker.startswith(BASE_CURRENCY)
+    }
+    if rates:
+        rate_table.update(rates, market_cache.oldest("currency", list(rates)))
+
+
+async def _fetch_finance_data(currencies: list, stocks: list, cryptos: list) -> None:
+    # fetch only the missing or stale symbols from yfinace
+    logger.info("fetching from yfinance", extra={"currencies": currencies, "stocks": stocks, "cryptos": cryptos})
+    currency_response, stock_response, crypto_response = await asyncio.gather(
+        _get_yahoo_currency_rate(currencies),
+        _get_batch_yahoo_stock_data(stocks),
+        _get_batch_yahoo_stock_data(cryptos),
+    )
+
+    # symbols that came back empty are retried after a short wait rather than cached or refetched per request
+    market_cache.mark_unavailable("stock", [symbol for symbol in stocks if symbol not in stock_response])
+    market_cache.mark_unavailable("crypto", [symbol for symbol in cryptos if symbol not in crypto_response])
+    # a currency yfinance could not resolve in an otherwise answered download (e.g. "XYZ") stays unknown,
+    # it is only asked for again after the currency TTL
+    currency_tickers = [base_ticker(currency) for currency in currencies if currency.upper() != BASE_CURRENCY]
+    if currency_response is None:
+        market_cache.mark_unavailable("currency", currency_tickers)
+    else:
+        market_cache.mark_unavailable(
+            "currency", [ticker for ticker in currency_tickers if ticker not in currency_response], CACHE_TTLS["currency"]
+        )
+
+    # merge into the cache next to the symbols that are still fresh
+    responses = {"currency": currency_response, "stock": stock_response, "crypto": crypto_response}
+    await market_cache.merge(
+        {asset_class: response for asset_class, response in responses.items() if response},
+        str(datetime.now(timezone.utc)),
+    )
+
+    if currency_response:
+        _load_rate_table()
+
+
+async def _refresh_finance_data(currencies: list, stocks: list, cryptos: list) -> None:
+    key = (
+        frozenset(currency.upper() for currency in currencies),
+        frozenset(stocks),
+        frozenset(cryptos),
+    )
+
+    # join a refresh already fetching everything requested instead of starting another one
+    task = next(
+        (
+            inflight_task
+            for inflight_key, inflight_task in _inflight_refreshes.items()
+            if all(requested <= inflight for requested, inflight in zip(key, inflight_key))
+        ),
+        None,
+    )
+    if task is None:
+        task = asyncio.ensure_future(_fetch_finance_data(currencies, stocks, cryptos))
+        _inflight_refreshes[key] = task
+        task.add_done_callback(lambda _: _inflight_refreshes.pop(key, None))
+
+    # shield so a cancelled caller does not cancel the fetch for everyone else
+    await asyncio.shield(task)
+
+
 async def get_finance_data(
-    currencies: list = None, stocks: list = None, cryptos: list = None
+    currencies: list = None, stocks: list = None, cryptos: list = None, refresh_within: float = 0,
+    bar_format: str = "columns",
 ):
+    # refresh_within (seconds) also refetches symbols that would expire within that window
+    # bar_format="rows" returns the old list of per-bar dicts instead of columnar bars
     # default currencies, stocks, and cryptos if not provided
     if currencies is None:
-        currencies = ["CNY", "HKD", "JPY", "USD"]
+        currencies = DEFAULT_CURRENCIES
     if stocks is None:
-        stocks = ["AAPL", "AMZN", "GOOG", "NVDA"]
+        stocks = DEFAULT_STOCKS
     if cryptos is None:
-        cryptos = ["BTC-USD", "DOGE-USD", "ETH-USD", "USDT-USD"]
-    else:
-        cryptos = [crypto + "-USD" for crypto in cryptos]
-
-    cache_folder = "finance_data_cache"
-    cache_dir = os.path.join(cache_folder, "data.json")
-    # create cache folder if it doesn't exist
-    os.makedirs(cache_folder, exist_ok=True)
-
-    # return cached data if not expired
-    if os.path.exists(cache_dir):
-        with open(cache_dir, "r") as f:
-            cached_data = json.load(f)
-            cached_time = datetime.fromisoformat(cached_data["timeRetrieved"])
-            if cached_time.date() == datetime.now(timezone.utc).date():
-                currency_tickers = [
-                    f"{from_currency.upper()}{to_currency.upper()}=X"
-                    for from_currency in currencies
-                    for to_currency in currencies
-                    if from_currency != to_currency
-                ]
-
-                # check if cache contains all requested data
-                if (
-                    all(
-                        currency in cached_data["currency"]
-                        for currency in currency_tickers
-                    )
-                    and all(stock in cached_data["stock"] for stock in stocks)
-                    and all(crypto in cached_data["crypto"] for crypto in cryptos)
-                ):
-                    return cached_data
-
-    # fetch new data from yfinace
-    print("fetch data from yfinance")
-    currency_response = await _get_yahoo_currency_rate(currencies)
-    stock_response = await _get_batch_yahoo_stock_data(stocks)
-    crypto_response = await _get_batch_yahoo_stock_data(cryptos)
+        cryptos = DEFAULT_CRYPTOS
+    cryptos = [crypto + "-USD" for crypto in cryptos]
 
-    if currency_response is None:
+    currency_tickers = [
+        base_ticker(currency)
+        for currency in currencies
+        if currency.upper() != BASE_CURRENCY
+    ]
+    requested = {"currency": currency_tickers, "stock": stocks, "crypto": cryptos}
+
+    margin = timedelta(seconds=refresh_within)
+    missing = market_cache.missing(margin, **requested)
+    locally_missing = sum(len(symbols) for symbols in missing.values())
+    if locally_missing:
+        # another worker may have refreshed them since we last read the cache
+        await market_cache.reload(**missing)
+        missing = market_cache.missing(margin, **requested)
+
+    # per symbol: hit in this worker's snapshot, shared (found in the backend), or miss (fetched from yfinance)
+    fetched = sum(len(symbols) for symbols in missing.values())
+    CACHE_LOOKUPS.labels("market", "hit").inc(sum(len(symbols) for symbols in requested.values()) - locally_missing)
+    CACHE_LOOKUPS.labels("market", "shared").inc(locally_missing - fetched)
+    CACHE_LOOKUPS.labels("market", "miss").inc(fetched)
+
+    if any(missing.values()):
+        await _refresh_finance_data(
+            [ticker[3:6] for ticker in missing["currency"]], missing["stock"], missing["crypto"]
+        )
+    if not rate_table.is_fresh() or not rate_table.currencies() >= {
+        currency.upper() for currency in currencies
+    }:
+        _load_rate_table()
+
+    result = market_cache.select(**requested)
+    # a currency that could not be fetched now or earlier leaves nothing to convert with
+    if not all(ticker in result["currency"] for ticker in currency_tickers):
         return None
 
-    result = {
-        "timeRetrieved": str(datetime.now(timezone.utc)),
-        "currency": currency_response,
-        "stock": stock_response,
-        "crypto": crypto_response,
-    }
-
-    # save data to cache
-    with open(cache_dir, "w") as f:
-        json.dump(result, f)
-
-    return result
+    for asset_class in ("stock", "crypto"):
+        result[asset_class] = {symbol: format_bars(bars, bar_format) for symbol, bars in result[asset_class].items()}
+    return {**result, "currency": rate_table.cross_rates(currencies)}
@@ -0,0 +1,117 @@
+import os
+from datetime import datetime, timezone, timedelta
+from services.finance.cache_backends import ASSET_CLASSES, MarketCacheBackend, empty_document, newest
+
+# how long a fetched symbol stays valid, per asset class (seconds)
+CACHE_TTLS = {
+    "currency": timedelta(seconds=int(os.getenv("FINANCE_TTL_CURRENCY", "3600"))),
+    "stock": timedelta(seconds=int(os.getenv("FINANCE_TTL_STOCK", "1800"))),
+    "crypto": timedelta(seconds=int(os.getenv("FINANCE_TTL_CRYPTO", "300"))),
+}
+# a symbol a fetch returned nothing for is not fetched again for this long
+RETRY_AFTER = timedelta(seconds=int(os.getenv("FINANCE_RETRY_AFTER", "60")))
+MAX_UNAVAILABLE = 10_000
+
+
+class MarketDataCache:
+    # this worker's snapshot of the cache; the backend decides whether other workers share it
+
+    def __init__(self, backend: MarketCacheBackend, ttls: dict = None) -> None:
+        self._backend = backend
+        self._ttls = ttls or CACHE_TTLS
+        self._data = None
+        # (asset class, symbol) -> when it may be fetched again, per worker
+        self._unavailable: dict[tuple, datetime] = {}
+
+    async def reload(self, **symbols: list) -> None:
+        # everything, or just the given symbols (e.g. reload(stock=["AAPL"])) on top of the snapshot
+        if not symbols or self._data is None:
+            self._data = await self._backend.load()
+            return
+
+        loaded = await self._backend.load(symbols)
+        for asset_class in ASSET_CLASSES:
+            self._data[asset_class].update(loaded[asset_class])
+            self._data["retrieved"][asset_class].update(loaded["retrieved"][asset_class])
+        self._data["timeRetrieved"] = newest(self._data["timeRetrieved"], loaded["timeRetrieved"])
+
+    def _loaded(self) -> dict:
+        # nothing loaded yet reads as empty, so the first lookup reports everything missing and reloads
+        return self._data if self._data is not None else empty_document()
+
+    def _is_fresh(self, asset_class: str, symbol: str, now: datetime, margin: timedelta) -> bool:
+        retrieved = self._loaded()["retrieved"][asset_class].get(symbol)
+        if retrieved is None:
+            return False
+        return now - datetime.fromisoformat(retrieved) < self._ttls[asset_class] - margin
+
+    def _is_unavailable(self, asset_class: str, symbol: str, now: datetime) -> bool:
+        retry_at = self._unavailable.get((asset_class, symbol))
+        if retry_at is None:
+            return False
+        if retry_at <= now:
+            del self._unavailable[(asset_class, symbol)]
+            return False
+        return True
+
+    def missing(self, margin: timedelta = timedelta(0), **symbols: list) -> dict:
+        # symbols absent or within margin of their class TTL, e.g. missing(stock=["AAPL"]) -> {"stock": [...]},
+        # leaving out those marked unavailable
+        now = datetime.now(timezone.utc)
+        return {
+            asset_class: [
+                symbol for symbol in requested
+                if not self._is_fresh(asset_class, symbol, now, margin)
+                and not self._is_unavailable(asset_class, symbol, now)
+            ]
+            for asset_class, requested in symbols.items()
+        }
+
+    def mark_unavailable(self, asset_class: str, symbols: list, retry_after: timedelta = RETRY_AFTER) -> None:
+        # symbols a fetch returned nothing for are not cached as data; marking them keeps a failing or unknown
+        # symbol from reaching yfinance on every request until retry_after has passed
+        retry_at = datetime.now(timezone.utc) + retry_after
+        for symbol in symbols:
+            self._unavailable.pop((asset_class, symbol), None)
+            self._unavailable[(asset_class, symbol)] = retry_at
+        while len(self._unavailable) > MAX_UNAVAILABLE:
+            del self._unavailable[next(iter(self._unavailable))]
+
+    def select(self, **symbols: list) -> dict:
+        # cached entries for the requested symbols, stamped with the newest retrieval among them
+        data = self._loaded()
+        result = {asset_class: {} for asset_class in ASSET_CLASSES}
+        retrieved_times = []
+        for asset_class, requested in symbols.items():
+            for symbol in requested:
+                if symbol in data[asset_class]:
+                    result[asset_class][symbol] = data[asset_class][symbol]
+                    retrieved_times.append(data["retrieved"][asset_class][symbol])
+        result["timeRetrieved"] = max(retrieved_times, key=datetime.fromisoformat, default=data["timeRetrieved"])
+        return result
+
+    def time_retrieved(self) -> str | None:
+        # newest merge this worker has seen
+        return self._loaded()["timeRetrieved"]
+
+    def entries(self, asset_class: str) -> dict:
+        return dict(self._loaded()[asset_class])
+
+    def oldest(self, asset_class: str, symbols: list) -> str | None:
+        retrieved = self._loaded()["retrieved"][asset_class]
+        return min((retrieved[symbol] for symbol in symbols), key=datetime.fromisoformat, default=None)
+
+    async def merge(self, entries: dict, time_retrieved: str) -> None:
+        # entries per asset class, e.g. {"stock": {"AAPL": {...}}}
+        if not entries:
+            return
+
+        await self._backend.store(entries, time_retrieved)
+        data = self._data if self._data is not None else empty_document()
+        for asset_class, symbols in entries.items():
+            data[asset_class].update(symbols)
+            data["retrieved"][asset_class].update({symbol: time_retrieved for symbol in symbols})
+            for symbol in symbols:
+                self._unavailable.pop((asset_class, symbol), None)
+        data["timeRetrieved"] = newest(data["timeRetrieved"], time_retrieved)
+        self._data = data
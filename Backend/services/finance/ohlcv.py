@@ -0,0 +1,56 @@
+import numpy as np
+from datetime import datetime
+
+# columnar bars: {"timestamps": [unix seconds], "open": [...], "high": [...], "low": [...], "close": [...], "volume": [...]}
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+BAR_FORMATS = ("columns", "rows")
+
+
+def empty_columns() -> dict:
+    return {"timestamps": [], **{field: [] for field in OHLCV_FIELDS}}
+
+
+def frame_to_columns(frame) -> dict:
+    # whole-column numpy conversion, no per-row Python work
+    if frame is None or frame.empty:
+        return empty_columns()
+    frame = frame.dropna(subset=["Open", "High", "Low", "Close"])
+    index = frame.index if frame.index.tz is not None else frame.index.tz_localize("UTC")
+    columns = {"timestamps": index.as_unit("s").asi8.tolist()}
+    for field in OHLCV_FIELDS:
+        columns[field] = np.nan_to_num(frame[field.capitalize()].to_numpy(dtype=np.float64)).tolist()
+    return columns
+
+
+def rows_to_columns(rows: list[dict]) -> dict:
+    # bars cached before the columnar format were lists of {"Date", "Open", ...}, only seen when migrating
+    columns = empty_columns()
+    for row in rows:
+        columns["timestamps"].append(int(datetime.fromisoformat(row["Date"]).timestamp()) if "Date" in row else 0)
+        for field in OHLCV_FIELDS:
+            columns[field].append(float(row.get(field.capitalize(), row.get("Close", 0.0))))
+    return columns
+
+
+def as_columns(bars) -> dict:
+    return rows_to_columns(bars) if isinstance(bars, list) else bars
+
+
+def columns_to_rows(columns: dict) -> list[dict]:
+    # compatibility mode: the old per-bar dicts
+    timestamps = np.asarray(columns["timestamps"], dtype="datetime64[s]")
+    dates = np.datetime_as_string(timestamps, timezone="UTC").tolist()
+    return [
+        {"Date": date, "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume}
+        for date, open_, high, low, close, volume in zip(dates, *(columns[field] for field in OHLCV_FIELDS))
+    ]
+
+
+def latest_close(bars) -> float | None:
+    closes = as_columns(bars)["close"]
+    return closes[-1] if closes else None
+
+
+def format_bars(bars, bar_format: str = "columns"):
+    columns = as_columns(bars)
+    return columns_to_rows(columns) if bar_format == "rows" else columns
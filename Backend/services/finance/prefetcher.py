@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+from pymongo.asynchronous.collection import AsyncCollection
+from services.finance.finance_data_scraper import (
+    get_finance_data,
+    DEFAULT_CURRENCIES,
+    DEFAULT_STOCKS,
+    DEFAULT_CRYPTOS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _env_list(name: str, default: list) -> list:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return [item.strip().upper() for item in value.split(",") if item.strip()]
+
+
+class MarketDataPrefetcher:
+
+    def __init__(self, asset_collection: AsyncCollection, interval: float = None) -> None:
+        self._asset_collection = asset_collection
+        # seconds between refreshes, 0 disables the prefetcher
+        self._interval = interval if interval is not None else float(os.getenv("FINANCE_PREFETCH_INTERVAL", "60"))
+        self._currencies = _env_list("FINANCE_WATCHLIST_CURRENCIES", DEFAULT_CURRENCIES)
+        self._stocks = _env_list("FINANCE_WATCHLIST_STOCKS", DEFAULT_STOCKS)
+        self._cryptos = _env_list("FINANCE_WATCHLIST_CRYPTOS", DEFAULT_CRYPTOS)
+        self._task = None
+
+    async def _held_symbols(self, category: str) -> list:
+        held = await self._asset_collection.distinct(
+            "type", {"category": {"$regex": f"^{category}$", "$options": "i"}}
+        )
+        return [symbol.upper() for symbol in held]
+
+    async def watchlist(self) -> dict:
+        # configured symbols plus everything users currently hold
+        held_currencies, held_stocks, held_cryptos = await asyncio.gather(
+            self._held_symbols("currency"),
+            self._held_symbols("stock"),
+            self._held_symbols("crypto"),
+        )
+        return {
+            "currencies": sorted(set(self._currencies) | set(held_currencies)),
+            "stocks": sorted(set(self._stocks) | set(held_stocks)),
+            "cryptos": sorted(set(self._cryptos) | set(held_cryptos)),
+        }
+
+    async def refresh(self) -> None:
+        watchlist = await self.watchlist()
+        # refetch anything that would expire before the next run, so requests never see it stale
+        await get_finance_data(
+            currencies=watchlist["currencies"],
+            stocks=watchlist["stocks"],
+            cryptos=watchlist["cryptos"],
+            refresh_within=self._interval,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("error prefetching market data")
+            await asyncio.sleep(self._interval)
+
+    def start(self) -> None:
+        if self._interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import pandas as pd
+import yfinance as yf
+from datetime import datetime, timezone, timedelta
+from pymongo import AsyncMongoClient, ASCENDING
+from services.finance.finance_data_scraper import _run_blocking, FETCH_TIMEOUT
+from services.finance.market_cache import CACHE_TTLS, RETRY_AFTER
+from services.finance.rate_table import base_ticker
+from services.finance.ohlcv import OHLCV_FIELDS, empty_columns, format_bars, frame_to_columns
+from services.monitoring.metrics import YFINANCE_FETCH_DURATION, YFINANCE_FETCH_FAILURES
+
+# bar size -> length of one bar
+HISTORY_INTERVALS = {"1h": timedelta(hours=1), "1d": timedelta(days=1)}
+# yfinance only serves hourly bars for roughly the last two years
+HISTORY_LIMITS = {"1h": timedelta(days=729)}
+# a range longer than this (a weekend plus a holiday) holds bars; yfinance returning none for it usually means
+# a failed fetch, so it is not recorded as covered and is retried after RETRY_AFTER
+MAX_EMPTY_RANGE = timedelta(days=4)
+MAX_RETRY_MARKS = 10_000
+
+PRICE_HISTORY_COLLECTION = "price_history"
+PRICE_COVERAGE_COLLECTION = "price_history_coverage"
+# created as a time-series collection by services.database.indexes
+PRICE_HISTORY_TIMESERIES = {"timeField": "timestamp", "metaField": "meta", "granularity": "hours"}
+
+logger = logging.getLogger(__name__)
+
+
+def history_ticker(symbol: str, asset_class: str) -> str:
+    # same ticker naming as get_finance_data: "BTC" -> "BTC-USD", "HKD" -> "USDHKD=X"
+    symbol = symbol.upper()
+    if asset_class == "crypto":
+        return symbol if symbol.endswith("-USD") else f"{symbol}-USD"
+    if asset_class == "currency":
+        return symbol if symbol.endswith("=X") else base_ticker(symbol)
+    return symbol
+
+
+def _utc(moment: datetime) -> datetime:
+    # Mongo hands datetimes back naive (UTC)
+    return moment if moment.tzinfo is not None else moment.replace(tzinfo=timezone.utc)
+
+
+def missing_ranges(coverage: dict | None, start: datetime, end: datetime, now: datetime, ttl: timedelta, step: timedelta) -> list:
+    # ranges of [start, end) not in the stored coverage, filling gaps so coverage stays one contiguous span
+    end = min(end, now)
+    if start >= end:
+        return []
+    if coverage is None:
+        return [(start, end)]
+
+    covered_start, covered_end, fetched_at = _utc(coverage["start"]), _utc(coverage["end"]), _utc(coverage["fetched_at"])
+    if now - fetched_at > ttl:
+        # the newest bar may still have been forming when it was fetched
+        covered_end = max(min(covered_end, fetched_at - step), covered_start)
+
+    # a head or tail range always touches the covered span, so coverage stays one contiguous span
+    ranges = []
+    if start < covered_start:
+        ranges.append((start, covered_start))
+    if end > covered_end:
+        ranges.append((covered_end, end))
+    return ranges
+
+
+async def _get_yahoo_history(ticker: str, interval: str, start: datetime, end: datetime):
+    try:
+        history = yf.Ticker(ticker)
+        with YFINANCE_FETCH_DURATION.labels("history").time():
+            return await _run_blocking(history.history, start=start, end=end, interval=interval, timeout=FETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        YFINANCE_FETCH_FAILURES.labels("history", "timeout").inc()
+        logger.warning("timed out fetching history", extra={"ticker": ticker, "interval": interval})
+        return None
+    except Exception as e:
+        YFINANCE_FETCH_FAILURES.labels("history", "error").inc()
+        logger.warning("error fetching history", extra={"ticker": ticker, "interval": interval, "error": str(e)})
+        return None
+
+
+def _history_documents(ticker: str, interval: str, frame, fetched_at: datetime) -> list[dict]:
+    columns = frame_to_columns(frame)
+    meta = {"symbol": ticker, "interval": interval}
+    timestamps = pd.to_datetime(columns["timestamps"], unit="s", utc=True).to_pydatetime()
+    return [
+        {"timestamp": timestamp, "meta": meta, "fetched_at": fetched_at, **dict(zip(OHLCV_FIELDS, values))}
+        for timestamp, *values in zip(timestamps, *(columns[field] for field in OHLCV_FIELDS))
+    ]
+
+
+class PriceHistoryStore:
+    # OHLCV bars persisted per (ticker, interval); coverage records which span is already stored
+
+    def __init__(self, database_entity: AsyncMongoClient) -> None:
+        self._bar_collection = database_entity["COMP4521"][PRICE_HISTORY_COLLECTION]
+        self._coverage_collection = database_entity["COMP4521"][PRICE_COVERAGE_COLLECTION]
+        # (ticker, interval) -> [lock, holders and waiters], dropped when the last one leaves
+        self._locks: dict[tuple, list] = {}
+        # (ticker, interval) -> when a range that came back empty may be fetched again
+        self._retry_at: dict[tuple, datetime] = {}
+
+    async def _store_range(self, ticker: str, interval: str, start: datetime, end: datetime) -> bool:
+        frame = await _get_yahoo_history(ticker, interval, start, end)
+        if frame is None:
+            return False
+        if frame.empty and end - start > MAX_EMPTY_RANGE:
+            logger.info("no history returned", extra={"ticker": ticker, "interval": interval})
+            self._retry_at.pop((ticker, interval), None)
+            self._retry_at[(ticker, interval)] = datetime.now(timezone.utc) + RETRY_AFTER
+            while len(self._retry_at) > MAX_RETRY_MARKS:
+                del self._retry_at[next(iter(self._retry_at))]
+            return False
+        # bars are only added: deleting a time range from a time-series collection needs MongoDB 7.0,
+        # so a refetched bar is stored again and get_history keeps the most recently fetched one
+        documents = _history_documents(ticker, interval, frame, datetime.now(timezone.utc))
+        if documents:
+            await self._bar_collection.insert_many(documents, ordered=False)
+        return True
+
+    async def ensure_range(self, ticker: str, asset_class: str, interval: str, start: datetime, end: datetime) -> int:
+        # fetch only what the coverage does not hold yet, one fetch per ticker/interval at a time
+        entry = self._locks.setdefault((ticker, interval), [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._ensure_range(ticker, asset_class, interval, start, end)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[(ticker, interval)]
+
+    async def _ensure_range(self, ticker: str, asset_class: str, interval: str, start: datetime, end: datetime) -> int:
+        retry_at = self._retry_at.get((ticker, interval))
+        if retry_at is not None:
+            if datetime.now(timezone.utc) < retry_at:
+                return 0
+            del self._retry_at[(ticker, interval)]
+
+        key = {"symbol": ticker, "interval": interval}
+        coverage = await self._coverage_collection.find_one(key, {"_id": 0})
+        now = datetime.now(timezone.utc)
+        ranges = missing_ranges(coverage, start, end, now, CACHE_TTLS[asset_class], HISTORY_INTERVALS[interval])
+        if not ranges:
+            return 0
+
+        fetched = [
+            (range_start, range_end)
+            for (range_start, range_end), stored in zip(
+                ranges, await asyncio.gather(*(self._store_range(ticker, interval, *r) for r in ranges))
+            )
+            if stored
+        ]
+        if not fetched:
+            return 0
+
+        starts = [range_start for range_start, _ in fetched]
+        ends = [range_end for _, range_end in fetched]
+        if coverage is not None:
+            starts.append(_utc(coverage["start"]))
+            ends.append(_utc(coverage["end"]))
+        new_end = max(ends)
+        tail_fetched = coverage is None or any(range_end >= new_end for _, range_end in fetched)
+        await self._coverage_collection.update_one(
+            key,
+            {"$set": {
+                "start": min(starts),
+                "end": new_end,
+                "fetched_at": now if tail_fetched else coverage["fetched_at"],
+            }},
+            upsert=True,
+        )
+        return len(fetched)
+
+    async def get_history(
+        self, symbol: str, asset_class: str, interval: str, start: datetime, end: datetime, bar_format: str = "columns"
+    ) -> dict:
+        ticker = history_ticker(symbol, asset_class)
+        limit = HISTORY_LIMITS.get(interval)
+        if limit is not None:
+            start = max(start, datetime.now(timezone.utc) - limit)
+        await self.ensure_range(ticker, asset_class, interval, start, end)
+
+        cursor = self._bar_collection.find(
+            {"meta.symbol": ticker, "meta.interval": interval, "timestamp": {"$gte": start, "$lt": end}},
+            {"_id": 0, "meta": 0},
+        ).sort([("timestamp", ASCENDING), ("fetched_at", ASCENDING)])
+        columns = empty_columns()
+        async for bar in cursor:
+            timestamp = int(_utc(bar["timestamp"]).timestamp())
+            if columns["timestamps"] and columns["timestamps"][-1] == timestamp:
+                # the same bar fetched again, the later fetch wins
+                for field in OHLCV_FIELDS:
+                    columns[field][-1] = bar[field]
+                continue
+            columns["timestamps"].append(timestamp)
+            for field in OHLCV_FIELDS:
+                columns[field].append(bar[field])
+        return {"symbol": ticker, "interval": interval, "bars": format_bars(columns, bar_format)}
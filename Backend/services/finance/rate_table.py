@@ -0,0 +1,84 @@
+from datetime import datetime, timezone, timedelta
+from services.finance.market_cache import CACHE_TTLS
+
+# every rate is stored against this currency, cross rates are derived on demand
+BASE_CURRENCY = "USD"
+
+
+def base_ticker(currency: str) -> str:
+    return f"{BASE_CURRENCY}{currency.upper()}=X"
+
+
+class RateTable:
+
+    def __init__(self, max_age: timedelta = CACHE_TTLS["currency"]) -> None:
+        self._max_age = max_age
+        # (units of currency per base unit, time retrieved) kept as one tuple so a refresh swaps both at once
+        self._snapshot = ({BASE_CURRENCY: 1.0}, None)
+
+    def update(self, rates: dict, time_retrieved: str) -> None:
+        # only base-quoted tickers are kept, so older caches holding every pair still load
+        base_rates = {BASE_CURRENCY: 1.0}
+        for ticker, rate in rates.items():
+            if len(ticker) == 8 and ticker.startswith(BASE_CURRENCY) and ticker.endswith("=X") and rate:
+                base_rates[ticker[3:6]] = float(rate)
+        self._snapshot = (base_rates, datetime.fromisoformat(time_retrieved))
+
+    def is_fresh(self) -> bool:
+        _, time_retrieved = self._snapshot
+        if time_retrieved is None:
+            return False
+        return datetime.now(timezone.utc) - time_retrieved < self._max_age
+
+    def snapshot(self) -> "RateTable":
+        # a detached copy that later refreshes do not touch, for conversions that must agree with each other
+        frozen = RateTable(self._max_age)
+        frozen._snapshot = self._snapshot
+        return frozen
+
+    def time_retrieved(self) -> datetime | None:
+        _, time_retrieved = self._snapshot
+        return time_retrieved
+
+    def currencies(self) -> set[str]:
+        base_rates, _ = self._snapshot
+        return set(base_rates)
+
+    def get_rate(self, from_currency: str, to_currency: str) -> float | None:
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        if from_currency == to_currency:
+            return 1.0
+
+        base_rates, _ = self._snapshot
+        if from_currency not in base_rates or to_currency not in base_rates:
+            return None
+        return base_rates[to_currency] / base_rates[from_currency]
+
+    def cross_rates(self, currencies: list[str]) -> dict:
+        # pair tickers in the shape yfinance uses, e.g. {"HKDJPY=X": 18.69}
+        rates = {}
+        for from_currency in currencies:
+            for to_currency in currencies:
+                rate = self.get_rate(from_currency, to_currency)
+                if from_currency.upper() != to_currency.upper() and rate is not None:
+                    rates[f"{from_currency.upper()}{to_currency.upper()}=X"] = rate
+        return rates
+
+    def convert(self, from_currency: str, to_currency: str, amount: float) -> float | None:
+        rate = self.get_rate(from_currency, to_currency)
+        if rate is None:
+            return None
+        return amount * rate
+
+    def convert_many(self, amounts: list[float], from_currencies: list[str], to_currency: str) -> list[float | None]:
+        # look each distinct currency up once, then apply to every amount
+        rates = {currency: self.get_rate(currency, to_currency) for currency in set(from_currencies)}
+        return [
+            None if rates[currency] is None else amount * rates[currency]
+            for amount, currency in zip(amounts, from_currencies)
+        ]
+
+
+# shared by every conversion call site, refreshed by get_finance_data
+rate_table = RateTable()
@@ -0,0 +1,93 @@
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+
+# latency buckets in seconds: sub-millisecond Mongo reads up to multi-second yfinance fetches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency", ["command", "collection"], buckets=LATENCY_BUCKETS
+)
+MONGO_COMMANDS = Counter("mongo_commands_total", "Mongo commands by outcome", ["command", "collection", "outcome"])
+YFINANCE_FETCH_DURATION = Histogram(
+    "yfinance_fetch_duration_seconds", "yfinance call latency", ["kind"], buckets=LATENCY_BUCKETS
+)
+YFINANCE_FETCH_FAILURES = Counter("yfinance_fetch_failures_total", "yfinance calls that failed", ["kind", "reason"])
+# cache: market (per symbol), response (per request), token (per verification)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by result", ["cache", "result"])
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt time per call, excluding the queue", ["operation"],
+    buckets=LATENCY_BUCKETS,
+)
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue", "Password hashes running or waiting for a worker", ["state"], multiprocess_mode="livesum"
+)
+PASSWORD_HASH_REJECTED = Counter("password_hash_rejected_total", "Password hashes refused because the queue was full")
+
+
+def render_metrics() -> tuple[bytes, str]:
+    # with several workers each writes to PROMETHEUS_MULTIPROC_DIR and one scrape aggregates them
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    # pure ASGI so streamed bodies are timed until their last chunk is sent
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # the route template keeps tokens out of the labels, unmatched paths share one series
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # every command pymongo sends, counted and timed per collection
+
+    def __init__(self) -> None:
+        self._collections = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _record(self, event, outcome: str) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMANDS.labels(event.command_name, collection, outcome).inc()
+        MONGO_COMMAND_DURATION.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event, "succeeded")
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event, "failed")
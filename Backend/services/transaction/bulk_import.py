@@ -0,0 +1,123 @@
+import codecs
+import csv
+import json
+import os
+import re
+from typing import AsyncIterator
+
+# characters one row / array element may span; a longer pending record (an unbalanced quote,
+# a malformed element) stops the import instead of buffering the rest of the body
+MAX_RECORD_SIZE = int(os.getenv("IMPORT_MAX_RECORD_SIZE", str(64 * 1024)))
+_CSV_BOUNDARY = re.compile('["\n]')
+
+
+def _check_pending(pending: int) -> None:
+    if pending > MAX_RECORD_SIZE:
+        raise ValueError(f"record longer than {MAX_RECORD_SIZE} characters")
+
+
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # decode incrementally so a multi-byte character split across chunks survives
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    # header row first, rows are handed out as soon as their line is complete
+    header = None
+    buffer = ""
+    in_quotes = False
+    async for text in _iter_text(chunks):
+        scanned = len(buffer)
+        buffer += text
+        # only the new text is scanned, a newline ends a row unless it sits inside a quoted field
+        row_end = 0
+        for match in _CSV_BOUNDARY.finditer(buffer, scanned):
+            if match.group() == '"':
+                in_quotes = not in_quotes
+            elif not in_quotes:
+                row_end = match.end()
+        complete, buffer = buffer[:row_end], buffer[row_end:]
+        _check_pending(len(buffer))
+        for row in csv.reader(complete.splitlines(keepends=True)):
+            if not row:
+                continue
+            if header is None:
+                header = [column.strip() for column in row]
+                continue
+            yield dict(zip(header, row))
+
+    for row in csv.reader(buffer.splitlines(keepends=True)):
+        if row and header is not None:
+            yield dict(zip(header, row))
+
+
+async def iter_ndjson_items(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    buffer = ""
+    async for text in _iter_text(chunks):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        _check_pending(len(buffer))
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+async def iter_json_array_items(chunks: AsyncIterator[bytes]) -> AsyncIterator:
+    # walks a top-level JSON array one element at a time without holding the whole body
+    decoder = json.JSONDecoder()
+    texts = _iter_text(chunks)
+    buffer = ""
+    position = 0
+    started = False
+    finished = False
+
+    async def more() -> bool:
+        nonlocal buffer, position
+        try:
+            text = await texts.__anext__()
+        except StopAsyncIteration:
+            return False
+        buffer = buffer[position:] + text
+        position = 0
+        return True
+
+    while not finished:
+        # skip whitespace and separators until the next element, "[" or "]"
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if not await more():
+                break
+            continue
+
+        if not started:
+            if buffer[position] != "[":
+                raise ValueError("expected a JSON array")
+            started = True
+            position += 1
+            continue
+        if buffer[position] == "]":
+            finished = True
+            continue
+
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # element continues in the next chunk, unless it is already too long to be one
+            _check_pending(len(buffer) - position)
+            if not await more():
+                raise
+            continue
+        yield item
+
+    if not finished:
+        raise ValueError("unterminated JSON array")
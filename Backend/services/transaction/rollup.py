@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone, timedelta
+from pymongo import AsyncMongoClient, DeleteMany, ReplaceOne, UpdateOne
+
+# longer than a transaction's insert + rollup $inc: one created this close to a rebuild's start may race it
+REBUILD_MARGIN = timedelta(seconds=5)
+
+
+def _field(name: str) -> str:
+    # category names become document keys, "." and a leading "$" are not allowed there, nor is an empty key
+    return name.replace(".", "_").lstrip("$") or "_"
+
+
+def _rounded(rollup: dict | None):
+    # float sums in a different order differ in the last bits, compare at cent-fraction precision
+    if isinstance(rollup, dict):
+        return {key: _rounded(value) for key, value in rollup.items()}
+    if isinstance(rollup, float):
+        return round(rollup, 6)
+    return rollup
+
+
+def _month(transaction: dict) -> str:
+    moment = transaction.get("datetime") or transaction["created_at"]
+    return moment.strftime("%Y-%m")
+
+
+class TransactionRollup:
+
+    def __init__(self, database_entity: AsyncMongoClient) -> None:
+        self._rollup_collection = database_entity["COMP4521"]["transaction_rollup"]
+        self._transaction_collection = database_entity["COMP4521"]["transaction"]
+        # users whose incremental update failed, their rollups are rebuilt on the next read
+        self._stale_collection = database_entity["COMP4521"]["transaction_rollup_stale"]
+
+    @staticmethod
+    def rollup_key(transaction: dict) -> dict:
+        return {
+            "user_id": transaction["user_id"],
+            "currency_type": transaction["currency_type"].upper(),
+            "month": _month(transaction),
+        }
+
+    @staticmethod
+    def _increments(transaction: dict, sign: int = 1) -> dict:
+        amount = transaction["amount"] * sign
+        transaction_type = _field(transaction["type"])
+        return {
+            "count": sign,
+            f"totals.{transaction_type}": amount,
+            f"categories.{transaction_type}.{_field(transaction['category_type'])}": amount,
+        }
+
+    async def apply(self, transaction: dict, sign: int = 1) -> None:
+        # sign=-1 reverses a transaction for delete paths, update = reverse old + apply new
+        await self._rollup_collection.update_one(
+            self.rollup_key(transaction), {"$inc": self._increments(transaction, sign)}, upsert=True
+        )
+
+    async def apply_many(self, transactions: list[dict], sign: int = 1) -> None:
+        # fold a batch into one $inc per rollup document
+        increments = {}
+        for transaction in transactions:
+            key = tuple(self.rollup_key(transaction).items())
+            rollup_increments = increments.setdefault(key, {})
+            for field, amount in self._increments(transaction, sign).items():
+                rollup_increments[field] = rollup_increments.get(field, 0) + amount
+        if increments:
+            await self._rollup_collection.bulk_write(
+                [UpdateOne(dict(key), {"$inc": inc}, upsert=True) for key, inc in increments.items()],
+                ordered=False,
+            )
+
+    async def mark_stale(self, user_id: str) -> None:
+        await self._stale_collection.update_one(
+            {"user_id": user_id}, {"$set": {"marked_at": datetime.now(timezone.utc)}}, upsert=True
+        )
+
+    async def get_rollups(self, user_id: str, month: str = None) -> list[dict]:
+        if await self._stale_collection.find_one_and_delete({"user_id": user_id}) is not None:
+            await self.rebuild(user_id)
+        query = {"user_id": user_id}
+        if month is not None:
+            query["month"] = month
+        return await self._rollup_collection.find(query, {"_id": 0}).sort("month", -1).to_list()
+
+    async def _recompute(self, user_id: str = None) -> dict:
+        # rollups recomputed from the raw transaction collection, keyed like rollup_key
+        match = {} if user_id is None else {"user_id": user_id}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "currency_type": {"$toUpper": "$currency_type"},
+                    "month": {"$dateToString": {
+                        "format": "%Y-%m", "date": {"$ifNull": ["$datetime", "$created_at"]}
+                    }},
+                    "type": "$type",
+                    "category_type": "$category_type",
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }},
+        ]
+        rollups = {}
+        async for group in await self._transaction_collection.aggregate(pipeline):
+            key = (group["_id"]["user_id"], group["_id"]["currency_type"], group["_id"]["month"])
+            rollup = rollups.setdefault(key, {
+                "user_id": key[0], "currency_type": key[1], "month": key[2],
+                "count": 0, "totals": {}, "categories": {},
+            })
+            transaction_type = _field(group["_id"]["type"])
+            rollup["count"] += group["count"]
+            rollup["totals"][transaction_type] = rollup["totals"].get(transaction_type, 0) + group["total"]
+            categories = rollup["categories"].setdefault(transaction_type, {})
+            category = _field(group["_id"]["category_type"])
+            # names that only differ in "." or a leading "$" share a field, as they do in apply_many
+            categories[category] = categories.get(category, 0) + group["total"]
+        return rollups
+
+    async def rebuild(self, user_id: str = None) -> int:
+        # backfill: replace the stored rollups for the scope with freshly computed ones.
+        # each document is replaced in place, so readers never see the scope empty and a concurrent
+        # $inc upsert never collides with an insert; only documents without any transactions are deleted
+        scope = {} if user_id is None else {"user_id": user_id}
+        started = datetime.now(timezone.utc)
+        rollups = await self._recompute(user_id)
+        stored = {
+            (rollup["user_id"], rollup["currency_type"], rollup["month"]): rollup["_id"]
+            async for rollup in self._rollup_collection.find(scope, {"user_id": 1, "currency_type": 1, "month": 1})
+        }
+        operations = [
+            ReplaceOne({"user_id": key[0], "currency_type": key[1], "month": key[2]}, rollup, upsert=True)
+            for key, rollup in rollups.items()
+        ]
+        removed = [_id for key, _id in stored.items() if key not in rollups]
+        if removed:
+            operations.append(DeleteMany({"_id": {"$in": removed}}))
+        if operations:
+            await self._rollup_collection.bulk_write(operations, ordered=False)
+
+        # an $inc from a transaction written during the rebuild may have been overwritten (or counted twice):
+        # those users are rebuilt again on their next read
+        for written_user_id in await self._transaction_collection.distinct(
+            "user_id", {**scope, "created_at": {"$gte": started - REBUILD_MARGIN}}
+        ):
+            await self.mark_stale(written_user_id)
+        return len(rollups)
+
+    async def check(self, user_id: str = None) -> list[dict]:
+        # rollup documents that differ from what the raw transactions add up to
+        expected = await self._recompute(user_id)
+        scope = {} if user_id is None else {"user_id": user_id}
+        stored = {
+            (rollup["user_id"], rollup["currency_type"], rollup["month"]): rollup
+            async for rollup in self._rollup_collection.find(scope, {"_id": 0})
+        }
+        mismatches = []
+        for key in expected.keys() | stored.keys():
+            if _rounded(expected.get(key)) != _rounded(stored.get(key)):
+                mismatches.append({"key": key, "expected": expected.get(key), "stored": stored.get(key)})
+        return mismatches
+
+
+if __name__ == "__main__":
+    # python -m services.transaction.rollup rebuild|check [--user USER_ID]
+    from dotenv import load_dotenv
+    from services.database.mongo_client import create_mongo_client
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify transaction rollups")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user", default=None, help="limit to one user_id")
+    args = parser.parse_args()
+
+    async def _main():
+        load_dotenv()
+        client = create_mongo_client(os.getenv("MONGO_URL"))
+        try:
+            rollup = TransactionRollup(client)
+            if args.command == "rebuild":
+                print(f"rebuilt {await rollup.rebuild(args.user)} rollup documents")
+            else:
+                mismatches = await rollup.check(args.user)
+                for mismatch in mismatches:
+                    print(mismatch)
+                print(f"{len(mismatches)} rollup documents out of date")
+        finally:
+            await client.close()
+
+    asyncio.run(_main())
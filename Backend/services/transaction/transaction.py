@@ -1,39 +1,336 @@
-from pymongo.mongo_client import MongoClient
-from datetime import datetime, timezone
-from ..authentication.token.access_token import JWTGenerator
-from ..finance.currency_conversion import currency_conversion
+import base64
+import json
+import logging
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo import AsyncMongoClient, DESCENDING
+from pymongo.errors import BulkWriteError
+from typing import AsyncIterator
+from API.model.POST_transaction_data import TransactionPostRequest
+from datetime import datetime, timezone, date, time, timedelta
+from ..finance.currency_conversion import convert_many
+from .rollup import TransactionRollup
+from ..database.write_versions import UserWriteVersions
+
+# newest first, _id breaks ties between transactions on the same day
+TRANSACTION_SORT = [("datetime", DESCENDING), ("_id", DESCENDING)]
+STREAM_CHUNK_SIZE = 500
+SUMMARY_PERIODS = ("day", "week", "month")
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def parse_transaction_date(date: str) -> datetime | None:
+    # the app sends dates like "2025-5-1"; store them as UTC midnight so they sort
+    try:
+        year, month, day = (int(part) for part in date.replace("/", "-").split("-"))
+        return datetime(year, month, day, tzinfo=timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+
+
+def encode_page_cursor(transaction: dict) -> str:
+    position = {"datetime": transaction.get("datetime"), "id": transaction["transaction_id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_page_cursor(cursor: str) -> tuple:
+    # raises ValueError for anything that is not a cursor we handed out
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position_datetime = position["datetime"] and datetime.fromisoformat(position["datetime"])
+        return position_datetime, ObjectId(position["id"])
+    except Exception as e:
+        raise ValueError(f"invalid page cursor: {cursor}") from e
+
+
+def _keyset_query(user_id: str, after: tuple = None) -> dict:
+    query = {"user_id": user_id}
+    if after is None:
+        return query
+
+    after_datetime, after_id = after
+    if after_datetime is None:
+        # undated transactions sort last, only older ids of those remain
+        query.update({"datetime": None, "_id": {"$lt": after_id}})
+    else:
+        query["$or"] = [
+            {"datetime": {"$lt": after_datetime}},
+            {"datetime": after_datetime, "_id": {"$lt": after_id}},
+            {"datetime": None},
+        ]
+    return query
 
 
 class TransactionController():
-    
-    def __init__(self, database_entity:MongoClient) -> None:
+
+    def __init__(self, database_entity:AsyncMongoClient) -> None:
         self._transaction_collection = database_entity['COMP4521']["transaction"]
-        self.token_generator = JWTGenerator()
+        self._rollup = TransactionRollup(database_entity)
+        self._write_versions = UserWriteVersions(database_entity)
+
+
+    @staticmethod
+    def _transaction_document(user_id: str, payload: dict) -> dict:
+        return {
+            "user_id": user_id,
+            **payload,
+            "datetime": parse_transaction_date(payload.get("date")),
+            "created_at":  datetime.now(timezone.utc),
+        }
 
 
-    async def insert_transaction(self, token: str , payload: dict) -> dict:
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def insert_transaction(self, user_id: str, payload: dict) -> dict:
 
-        transaction_doc = {"user_id": user_id, **payload, "created_at":  datetime.now(timezone.utc)}
-        result = self._transaction_collection.insert_one(transaction_doc)
+        transaction_doc = self._transaction_document(user_id, payload)
+        result = await self._transaction_collection.insert_one(transaction_doc)
+        await self._apply_rollup(user_id, [transaction_doc])
+        await self._write_versions.bump(user_id, "transaction")
         return {"status": 200, "transaction_id": str(result.inserted_id)}
-    
 
-    async def get_transactions_by_user(self, token: str, target_currency) -> list[dict]:
 
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload['user_id'])
+    async def _apply_rollup(self, user_id: str, transactions: list[dict]) -> None:
+        # the transactions are already stored, so a failed rollup update is not the caller's error:
+        # the user is marked stale and their rollups are rebuilt on the next balance read
+        try:
+            await self._rollup.apply_many(transactions)
+        except Exception:
+            logger.exception("rollup update failed, marking for rebuild", extra={"user_id": user_id})
+            try:
+                await self._rollup.mark_stale(user_id)
+            except Exception:
+                # `python -m services.transaction.rollup check` still finds the drift
+                logger.exception("could not mark rollups for rebuild", extra={"user_id": user_id})
+
+
+    async def _insert_batch(self, batch: list[dict], row_numbers: list[int], report_error) -> int:
+        # unordered so one bad document does not stop the rest of the batch
+        written = batch
+        try:
+            await self._transaction_collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed_indexes = set()
+            for error in e.details["writeErrors"]:
+                failed_indexes.add(error["index"])
+                report_error(row_numbers[error["index"]], error["errmsg"])
+            written = [doc for index, doc in enumerate(batch) if index not in failed_indexes]
+        if written:
+            await self._apply_rollup(written[0]["user_id"], written)
+        return len(written)
+
+
+    async def import_transactions(self, user_id: str, rows: AsyncIterator[dict]) -> dict:
+        # rows arrive from a streaming parser and are written in insert_many batches
+        inserted = 0
+        errors = []
+        failed = 0
+
+        def report_error(row_number: int, error: str) -> None:
+            nonlocal failed
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "error": error})
+
+        batch, row_numbers = [], []
+        row_number = 0
+        parse_error = None
+        try:
+            async for row in rows:
+                row_number += 1
+                try:
+                    payload = TransactionPostRequest.model_validate(row).model_dump()
+                except ValidationError as e:
+                    report_error(row_number, "; ".join(
+                        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+                        for error in e.errors()
+                    ))
+                    continue
+
+                batch.append(self._transaction_document(user_id, payload))
+                row_numbers.append(row_number)
+                if len(batch) == IMPORT_BATCH_SIZE:
+                    inserted += await self._insert_batch(batch, row_numbers, report_error)
+                    batch, row_numbers = [], []
+        except ValueError as e:
+            # malformed body: keep what was already parsed and stop there
+            parse_error = f"could not parse body after row {row_number}: {e}"
 
-        cursor = self._transaction_collection.find({"user_id": user_id}).sort("datetime", -1)
-        transactions = list(cursor)
-        for transaction in transactions:
+        if batch:
+            inserted += await self._insert_batch(batch, row_numbers, report_error)
+        if inserted:
+            await self._write_versions.bump(user_id, "transaction")
+
+        result = {"inserted": inserted, "failed": failed, "errors": errors}
+        if parse_error is not None:
+            return {"status": 400, "error": parse_error, **result}
+        return {"status": 200, **result}
+
+
+    async def _convert_transactions(self, transactions: list[dict], target_currency: str, rates=None) -> list[dict]:
+        converted_amounts = await convert_many(
+            [transaction["amount"] for transaction in transactions],
+            [transaction["currency_type"] for transaction in transactions],
+            target_currency,
+            rates,
+        )
+        for transaction, converted_amount in zip(transactions, converted_amounts):
             transaction["transaction_id"] = str(transaction["_id"])
             transaction.pop("_id", None)
             transaction.pop("user_id", None)
 
-            transaction["converted_amount"] = float(await currency_conversion(transaction["currency_type"].upper(), target_currency, transaction["amount"]))
-            if "datetime" in transaction:
+            transaction["converted_amount"] = converted_amount
+            if transaction.get("datetime"):
                 transaction["datetime"] = transaction["datetime"].isoformat()
+            if "created_at" in transaction:
+                transaction["created_at"] = transaction["created_at"].isoformat()
+
+        return transactions
+
+
+    async def get_currencies(self, user_id: str) -> list[str]:
+        currencies = await self._transaction_collection.distinct("currency_type", {"user_id": user_id})
+        return sorted({currency.upper() for currency in currencies})
+
+
+    async def get_transactions_by_user(
+        self, user_id: str, target_currency, limit: int = None, after: tuple = None, rates=None
+    ) -> tuple[list[dict], str | None]:
+        # returns one page and the cursor of the next one (None on the last page)
+        cursor = self._transaction_collection.find(_keyset_query(user_id, after)).sort(TRANSACTION_SORT)
+        if limit is None:
+            transactions = await cursor.to_list()
+            return await self._convert_transactions(transactions, target_currency, rates), None
+
+        # fetch one extra row to know whether another page exists
+        transactions = await cursor.limit(limit + 1).to_list()
+        has_next = len(transactions) > limit
+        transactions = await self._convert_transactions(transactions[:limit], target_currency, rates)
+        next_cursor = encode_page_cursor(transactions[-1]) if has_next else None
+        return transactions, next_cursor
+
+
+    async def stream_transactions(self, user_id: str, target_currency, limit: int = None, after: tuple = None):
+        # yields NDJSON lines, converting a chunk at a time as the cursor advances
+        cursor = self._transaction_collection.find(_keyset_query(user_id, after)).sort(TRANSACTION_SORT)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        cursor = cursor.batch_size(STREAM_CHUNK_SIZE)
+
+        chunk = []
+        async for transaction in cursor:
+            chunk.append(transaction)
+            if len(chunk) == STREAM_CHUNK_SIZE:
+                for converted in await self._convert_transactions(chunk, target_currency):
+                    yield json.dumps(converted) + "\n"
+                chunk = []
+        for converted in await self._convert_transactions(chunk, target_currency):
+            yield json.dumps(converted) + "\n"
+
+
+    async def get_transaction_summary(
+        self, user_id: str, target_currency: str, period: str = "month", start: date = None, end: date = None
+    ) -> dict:
+        match = {"user_id": user_id}
+        if start is not None or end is not None:
+            match["datetime"] = {}
+            if start is not None:
+                match["datetime"]["$gte"] = datetime.combine(start, time(), timezone.utc)
+            if end is not None:
+                match["datetime"]["$lt"] = datetime.combine(end + timedelta(days=1), time(), timezone.utc)
+
+        # totals per currency are grouped in Mongo, only the grouped sums are converted here
+        # $dateTrunc needs MongoDB >= 5.0 (mongomock does not support it either)
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "period": {"$dateTrunc": {
+                        "date": {"$ifNull": ["$datetime", "$created_at"]},
+                        "unit": period,
+                        "startOfWeek": "monday",
+                    }},
+                    "type": "$type",
+                    "category_type": "$category_type",
+                    "currency_type": {"$toUpper": "$currency_type"},
+                },
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }},
+        ]
+        groups = await (await self._transaction_collection.aggregate(pipeline)).to_list()
+        converted_totals = await convert_many(
+            [group["total"] for group in groups],
+            [group["_id"]["currency_type"] for group in groups],
+            target_currency,
+        )
+
+        # fold the per-currency groups into one row per period, type and category
+        summary = {}
+        totals = {}
+        # groups in a currency without a rate stay in their own currency, so the client can tell totals are partial
+        unconverted = []
+        for group, converted_total in zip(groups, converted_totals):
+            if converted_total is None:
+                unconverted.append({
+                    "period": group["_id"]["period"].isoformat(),
+                    "type": group["_id"]["type"],
+                    "category_type": group["_id"]["category_type"],
+                    "currency_type": group["_id"]["currency_type"],
+                    "total": group["total"],
+                    "count": group["count"],
+                })
+                continue
+            key = (group["_id"]["period"], group["_id"]["type"], group["_id"]["category_type"])
+            row = summary.setdefault(key, {
+                "period": group["_id"]["period"].isoformat(),
+                "type": group["_id"]["type"],
+                "category_type": group["_id"]["category_type"],
+                "total": 0.0,
+                "count": 0,
+            })
+            row["total"] += converted_total
+            row["count"] += group["count"]
+            totals[group["_id"]["type"]] = totals.get(group["_id"]["type"], 0.0) + converted_total
+
+        return {
+            "currency": target_currency.upper(),
+            "period": period,
+            "summary": sorted(
+                summary.values(), key=lambda row: (row["period"], row["type"], row["category_type"]), reverse=True
+            ),
+            "totals": totals,
+            "unconverted": sorted(
+                unconverted, key=lambda row: (row["period"], row["type"], row["category_type"]), reverse=True
+            ),
+        }
+
+
+    async def get_balance(self, user_id: str, target_currency: str, month: str = None) -> dict:
+        # reads the precomputed monthly rollups instead of scanning raw transactions
+        rollups = await self._rollup.get_rollups(user_id, month)
+        amounts, currencies, targets = [], [], []
+        for rollup in rollups:
+            for transaction_type, total in rollup["totals"].items():
+                amounts.append(total)
+                currencies.append(rollup["currency_type"])
+                targets.append((rollup["month"], transaction_type))
+        converted_amounts = await convert_many(amounts, currencies, target_currency)
+
+        months = {}
+        for (rollup_month, transaction_type), converted_amount in zip(targets, converted_amounts):
+            if converted_amount is None:
+                continue
+            totals = months.setdefault(rollup_month, {})
+            totals[transaction_type] = totals.get(transaction_type, 0.0) + converted_amount
 
-        return transactions
\ No newline at end of file
+        income = sum(totals.get("income", 0.0) for totals in months.values())
+        expense = sum(totals.get("expense", 0.0) for totals in months.values())
+        return {
+            "currency": target_currency.upper(),
+            "income": income,
+            "expense": expense,
+            "balance": income - expense,
+            "months": [{"month": rollup_month, **totals} for rollup_month, totals in sorted(months.items(), reverse=True)],
+        }
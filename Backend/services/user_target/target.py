@@ -1,25 +1,61 @@
-from pymongo.mongo_client import MongoClient
-from datetime import datetime, timezone
-from ..authentication.token.access_token import JWTGenerator
+from pymongo import AsyncMongoClient
+from datetime import datetime, timezone, timedelta
+from ..finance.currency_conversion import get_rate_snapshot
+from ..database.write_versions import UserWriteVersions
+
+# which transactions count towards a target, as the app computes it: budgets against expenses, savings against income
+TARGET_TRANSACTION_TYPES = {"budget": "expense", "saving": "income"}
+PROGRESS_PERIODS = ("week", "month", "year", "all")
+
+
+def period_start(period: str, now: datetime) -> datetime | None:
+    today = datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    if period == "month":
+        return today.replace(day=1)
+    if period == "year":
+        return today.replace(month=1, day=1)
+    return None
+
+
+def target_progress(target: dict, rates, target_currency: str) -> dict:
+    # target joined with its per-currency transaction groups -> progress, one conversion per group
+    spent = 0.0
+    count = 0
+    for group in target["groups"]:
+        converted = rates.convert(group["_id"], target["currency"], group["total"])
+        if converted is not None:
+            spent += converted
+            count += group["count"]
+    return {
+        "target_type": target["target_type"],
+        "transaction_type": target["transaction_type"],
+        "amount": target["amount"],
+        "currency": target["currency"],
+        "current_amount": spent,
+        "transaction_count": count,
+        "progress": spent / target["amount"] if target["amount"] else None,
+        "converted_amount": rates.convert(target["currency"], target_currency, target["amount"]),
+        "converted_current_amount": rates.convert(target["currency"], target_currency, spent),
+        "converted_currency": target_currency,
+    }
 
 
 class TargetController:
 
-    def __init__(self, database_entity: MongoClient) -> None:
+    def __init__(self, database_entity: AsyncMongoClient) -> None:
         self._target_collection = database_entity["COMP4521"]["target"]
-        self.token_generator = JWTGenerator()
+        self._transaction_collection = database_entity["COMP4521"]["transaction"]
+        self._write_versions = UserWriteVersions(database_entity)
 
     async def insert_target(
-        self, token: str, target_type: str, amount: float, currency: str
+        self, user_id: str, target_type: str, amount: float, currency: str
     ) -> dict:
         # check if required fields are present in payload
-        if not token or not target_type or amount == None or not currency:
+        if not user_id or not target_type or amount == None or not currency:
             return {"status": 400, "message": "Missing required fields"}
 
-        # convert token to user_id
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload["user_id"])
-
         target_doc = {
             "user_id": user_id,
             "target_type": target_type,
@@ -28,7 +64,7 @@ class TargetController:
             "datetime": datetime.now(timezone.utc),
         }
 
-        result = self._target_collection.replace_one(
+        result = await self._target_collection.replace_one(
             {"user_id": user_id, "target_type": target_type},
             target_doc,
             upsert=True,
@@ -36,16 +72,14 @@ class TargetController:
         # check if target is added/updated
         if result.modified_count == 0 and result.upserted_id == None:
             return {"status": 500, "message": "Failed to update target"}
+        await self._write_versions.bump(user_id, "target")
 
         return {"status": 200}
 
-    async def get_targets_by_user(self, token: str) -> dict:
-        # convert token to user_id
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload["user_id"])
+    async def get_targets_by_user(self, user_id: str) -> dict:
 
         cursor = self._target_collection.find({"user_id": user_id})
-        targets = list(cursor)
+        targets = await cursor.to_list()
 
         if not targets:
             return {"status": 200, "targets": []}
@@ -56,17 +90,57 @@ class TargetController:
 
         return {"status": 200, "targets": targets}
 
-    async def delete_target_by_user(self, token: str) -> dict:
-        # convert token to user_id
-        user_payload = self.token_generator.verify_jwt_token(token)
-        user_id = str(user_payload["user_id"])
+    async def delete_target_by_user(self, user_id: str) -> dict:
 
-        result = self._target_collection.delete_many({"user_id": user_id})
+        result = await self._target_collection.delete_many({"user_id": user_id})
 
         if result.deleted_count == 0:
             return {"status": 404, "message": "No targets found for the user"}
+        await self._write_versions.bump(user_id, "target")
 
         return {
             "status": 200,
             "message": f"Deleted {result.deleted_count} targets for user {user_id}",
         }
+
+    async def get_target_progress(self, user_id: str, target_currency: str, period: str = "month") -> dict:
+        # each target joined with its period's transactions, summed per currency inside Mongo
+        start = period_start(period, datetime.now(timezone.utc))
+        transaction_match = {"user_id": user_id}
+        if start is not None:
+            transaction_match["datetime"] = {"$gte": start}
+
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$addFields": {"transaction_type": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [{"$toLower": "$target_type"}, target_type]}, "then": transaction_type}
+                    for target_type, transaction_type in TARGET_TRANSACTION_TYPES.items()
+                ],
+                "default": None,
+            }}}},
+            {"$lookup": {
+                "from": self._transaction_collection.name,
+                "localField": "transaction_type",
+                "foreignField": "type",
+                "pipeline": [
+                    {"$match": transaction_match},
+                    {"$group": {"_id": {"$toUpper": "$currency_type"}, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                ],
+                "as": "groups",
+            }},
+            {"$project": {"_id": 0, "user_id": 0}},
+        ]
+        targets = await (await self._target_collection.aggregate(pipeline)).to_list()
+
+        # one rate snapshot for every currency involved
+        target_currency = target_currency.upper()
+        currencies = {target_currency} | {target["currency"] for target in targets}
+        currencies |= {group["_id"] for target in targets for group in target["groups"]}
+        rates = await get_rate_snapshot(sorted(currencies))
+        return {
+            "status": 200,
+            "period": period,
+            "period_start": start and start.isoformat(),
+            "targets": [target_progress(target, rates, target_currency) for target in targets],
+        }
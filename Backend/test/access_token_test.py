@@ -1,10 +1,13 @@
 import pytest
 import time
 from datetime import timedelta, datetime
-from services.authentication.token.access_token import JWTGenerator  
+from services.authentication.token import access_token
+from services.authentication.token.access_token import JWTGenerator, VerifiedTokenCache
 
 @pytest.fixture
-def jwt_generator():
+def jwt_generator(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET_KEY", "testsecretkeytestsecretkey1234567")
+    monkeypatch.setenv("JWT_ALGORITHM", "HS256")
     return JWTGenerator()
 
 def test_create_jwt_token_returns_string(jwt_generator):
@@ -23,3 +26,29 @@ def test_verify_jwt_token_invalid(jwt_generator):
     invalid_token = "this.is.an.invalid.token"
     result = jwt_generator.verify_jwt_token(invalid_token)
     assert result is False
+
+def test_verified_claims_are_cached_until_exp():
+    cache = VerifiedTokenCache(max_size=2)
+    cache.put("live", {"user_id": 1, "exp": time.time() + 60})
+    cache.put("expired", {"user_id": 2, "exp": time.time() - 1})
+    cache.put("no-exp", {"user_id": 3})
+    assert cache.get("live")["user_id"] == 1
+    assert cache.get("expired") is None
+    assert cache.get("no-exp") is None
+
+def test_verified_token_cache_evicts_least_recently_used():
+    cache = VerifiedTokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"exp": exp})
+    cache.put("b", {"exp": exp})
+    cache.get("a")
+    cache.put("c", {"exp": exp})
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+def test_verify_jwt_token_uses_cached_claims(jwt_generator, monkeypatch):
+    token = jwt_generator.create_jwt_token({"user_id": 7, "username": "cached"})
+    jwt_generator.verify_jwt_token(token)
+    monkeypatch.setattr(access_token.jwt, "decode", lambda *args, **kwargs: pytest.fail("decoded twice"))
+    assert jwt_generator.verify_jwt_token(token)["user_id"] == 7
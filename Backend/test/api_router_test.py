@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from API import api_router
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    router = APIRouter()
+    api_router.APIRouteDefintion(router, MagicMock())
+    app.include_router(router)
+    return TestClient(app)
+
+def test_finance_accepts_empty_and_partial_bodies(monkeypatch):
+    calls = []
+
+    async def fake_finance_data(currencies=None, stocks=None, cryptos=None, bar_format="columns"):
+        calls.append((currencies, stocks, cryptos))
+        return {"timeRetrieved": "2025-05-01 00:00:00+00:00", "currency": {}, "stock": {}, "crypto": {}}
+
+    monkeypatch.setattr(api_router, "get_finance_data", fake_finance_data)
+    client = _client()
+    empty = client.post("/finance", json={})
+    partial = client.post("/finance", json={"stock": ["AAPL"]})
+    assert empty.status_code == 200 and partial.status_code == 200
+    assert calls == [(None, None, None), (None, ["AAPL"], None)]
+    # defaults and an explicit empty list are different bodies
+    assert empty.headers["etag"] != client.post("/finance", json={"stock": []}).headers["etag"]
+
+    not_modified = client.post("/finance", json={}, headers={"If-None-Match": empty.headers["etag"]})
+    assert not_modified.status_code == 304
@@ -0,0 +1,43 @@
+import asyncio
+from services.authentication.controller import auth_controller
+from services.authentication.controller.auth_controller import RegisterController, USERNAME_INDEX
+
+
+class FakeCredentialCollection:
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.inserted = []
+
+    async def index_information(self):
+        if isinstance(self.indexes, Exception):
+            raise self.indexes
+        return self.indexes
+
+    async def insert_one(self, document):
+        self.inserted.append(document)
+        return type("InsertOneResult", (), {"inserted_id": "id-1"})()
+
+
+class FakeHasher:
+    async def hash(self, password):
+        return b"hashed"
+
+
+def _register(collection, monkeypatch):
+    monkeypatch.setattr(auth_controller, "password_hasher", FakeHasher())
+    controller = RegisterController({"COMP4521": {"credential": collection}})
+    return asyncio.run(controller.register_credential({"username": "alice", "password": "pw"}))
+
+def test_registration_refused_without_unique_username_index(monkeypatch):
+    collection = FakeCredentialCollection({"_id_": {"key": [("_id", 1)]}})
+    assert _register(collection, monkeypatch)["status"] == 503
+    assert collection.inserted == []
+
+def test_registration_refused_when_indexes_cannot_be_read(monkeypatch):
+    collection = FakeCredentialCollection(ConnectionError("mongo down"))
+    assert _register(collection, monkeypatch)["status"] == 503
+
+def test_registration_with_unique_username_index(monkeypatch):
+    collection = FakeCredentialCollection({USERNAME_INDEX: {"key": [("username", 1)], "unique": True}})
+    assert _register(collection, monkeypatch)["status"] == 200
+    assert collection.inserted[0]["username"] == "alice"
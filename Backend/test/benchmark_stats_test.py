@@ -0,0 +1,30 @@
+from benchmark.stats import compare, percentile, summarize
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.99) == 7
+    assert percentile([], 0.5) == 0.0
+
+def test_summarize():
+    summary = summarize([0.001] * 98 + [0.010, 0.020], 0.5, {200: 99, 500: 1})
+    assert summary["requests"] == 100
+    assert summary["errors"] == 1
+    assert summary["throughput_rps"] == 200
+    assert summary["p50_ms"] == 1.0
+    assert summary["p99_ms"] == 10.0
+    assert summary["max_ms"] == 20.0
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    baseline = {"api": {"login": {"p50_ms": 10.0, "p99_ms": 20.0}}, "micro": {"jwt": {"median_us": 4.0}}}
+    current = {
+        "api": {"login": {"p50_ms": 10.5, "p99_ms": 30.0}, "new": {"p50_ms": 1.0, "p99_ms": 1.0}},
+        "micro": {"jwt": {"median_us": 3.0}},
+    }
+    rows = {(row["benchmark"], row["metric"]): row for row in compare(baseline, current, threshold=0.10)}
+    assert not rows[("api.login", "p50_ms")]["regression"]
+    assert rows[("api.login", "p99_ms")]["regression"]
+    assert rows[("micro.jwt", "median_us")]["change"] == -0.25
+    assert ("api.new", "p50_ms") not in rows
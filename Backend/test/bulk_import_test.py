@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from services.transaction import bulk_import
+from services.transaction.bulk_import import iter_csv_rows, iter_json_array_items, iter_ndjson_items
+
+
+def split_into_chunks(body: bytes, size: int):
+    async def chunks():
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+    return chunks()
+
+def collect(rows):
+    async def run():
+        return [row async for row in rows]
+    return asyncio.run(run())
+
+def test_csv_rows_across_chunk_boundaries():
+    body = 'type,amount\nexpense,1\nincome,"2,5"\n"multi\nline",3'.encode()
+    rows = collect(iter_csv_rows(split_into_chunks(body, 3)))
+    assert rows == [
+        {"type": "expense", "amount": "1"},
+        {"type": "income", "amount": "2,5"},
+        {"type": "multi\nline", "amount": "3"},
+    ]
+
+def test_csv_multibyte_character_split_across_chunks():
+    body = "type,category_type\nexpense,餐飲\n".encode()
+    assert collect(iter_csv_rows(split_into_chunks(body, 1))) == [{"type": "expense", "category_type": "餐飲"}]
+
+def test_json_array_items_across_chunk_boundaries():
+    body = b'[ {"amount": 1, "note": "a]b"}, {"amount": 2} ,{"amount": 3}]'
+    assert collect(iter_json_array_items(split_into_chunks(body, 4))) == [
+        {"amount": 1, "note": "a]b"}, {"amount": 2}, {"amount": 3}
+    ]
+
+def test_json_array_rejects_truncated_body():
+    with pytest.raises(ValueError):
+        collect(iter_json_array_items(split_into_chunks(b'[{"amount": 1}, {"amou', 5)))
+
+def test_ndjson_items():
+    body = b'{"amount": 1}\n\n{"amount": 2}'
+    assert collect(iter_ndjson_items(split_into_chunks(body, 5))) == [{"amount": 1}, {"amount": 2}]
+
+def test_csv_unbalanced_quote_stops_at_record_limit(monkeypatch):
+    monkeypatch.setattr(bulk_import, "MAX_RECORD_SIZE", 64)
+    body = ('type,amount\nexpense,1\n"never closed,2\n' + "expense,3\n" * 100).encode()
+    rows = []
+    with pytest.raises(ValueError):
+        async def run():
+            async for row in iter_csv_rows(split_into_chunks(body, 8)):
+                rows.append(row)
+        asyncio.run(run())
+    assert rows == [{"type": "expense", "amount": "1"}]
+
+def test_csv_quoted_newline_in_a_large_chunk_is_not_an_overflow(monkeypatch):
+    monkeypatch.setattr(bulk_import, "MAX_RECORD_SIZE", 64)
+    body = ("type,amount\n" + "expense,1\n" * 100 + '"multi\nline",2\n').encode()
+    rows = collect(iter_csv_rows(split_into_chunks(body, 4096)))
+    assert len(rows) == 101 and rows[-1] == {"type": "multi\nline", "amount": "2"}
+
+def test_json_array_malformed_element_stops_at_record_limit(monkeypatch):
+    monkeypatch.setattr(bulk_import, "MAX_RECORD_SIZE", 64)
+    body = b'[{"amount": 1}, {"amount": tru}, ' + b'{"amount": 2}, ' * 100 + b"]"
+    with pytest.raises(ValueError, match="record longer than 64"):
+        collect(iter_json_array_items(split_into_chunks(body, 8)))
+
+def test_ndjson_line_longer_than_record_limit(monkeypatch):
+    monkeypatch.setattr(bulk_import, "MAX_RECORD_SIZE", 16)
+    with pytest.raises(ValueError):
+        collect(iter_ndjson_items(split_into_chunks(b'{"note": "' + b"x" * 100 + b'"}\n', 8)))
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone, timedelta
+from services.finance.cache_backends import (
+    MemoryCacheBackend, FileCacheBackend, MongoCacheBackend, RedisCacheBackend, create_cache_backend
+)
+from services.finance.market_cache import MarketDataCache
+
+
+class FakeRedis:
+    # the hash commands RedisCacheBackend uses, values come back as bytes like redis-py
+    def __init__(self):
+        self.hashes = {}
+
+    async def eval(self, script, numkeys, key, time_field, time_retrieved, *pairs):
+        # what RedisCacheBackend.STORE_SCRIPT does
+        fields = self.hashes.setdefault(key, {})
+        current = fields.get(time_field)
+        if current is None or current.decode() < time_retrieved:
+            fields[time_field] = time_retrieved.encode()
+        fields.update({field: value.encode() for field, value in zip(pairs[::2], pairs[1::2])})
+
+    async def hgetall(self, key):
+        return {field.encode(): value for field, value in self.hashes.get(key, {}).items()}
+
+    async def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(field) for field in fields]
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    # the upserts and $in reads MongoCacheBackend uses
+    def __init__(self):
+        self.documents = {}
+
+    def find(self, query):
+        ids = query.get("_id", {}).get("$in")
+        return FakeCursor([dict(doc) for _id, doc in self.documents.items() if ids is None or _id in ids])
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            document = self.documents.setdefault(operation._filter["_id"], {"_id": operation._filter["_id"]})
+            document.update(operation._doc.get("$set", {}))
+            for field, value in operation._doc.get("$max", {}).items():
+                document[field] = max(document.get(field) or value, value)
+
+
+@pytest.fixture(params=["memory", "file", "mongo", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCacheBackend()
+    if request.param == "file":
+        return FileCacheBackend(str(tmp_path / "data.json"))
+    if request.param == "mongo":
+        return MongoCacheBackend(FakeCollection())
+    return RedisCacheBackend(FakeRedis())
+
+def test_store_and_load_round_trip(backend):
+    earlier = str(datetime.now(timezone.utc) - timedelta(minutes=1))
+    now = str(datetime.now(timezone.utc))
+    asyncio.run(backend.store({"stock": {"AAPL": {"close": [1.0]}}, "currency": {"USDHKD=X": 7.8}}, earlier))
+    asyncio.run(backend.store({"stock": {"TSLA": {"close": [2.0]}}}, now))
+
+    document = asyncio.run(backend.load())
+    assert document["stock"] == {"AAPL": {"close": [1.0]}, "TSLA": {"close": [2.0]}}
+    assert document["currency"] == {"USDHKD=X": 7.8}
+    assert document["retrieved"]["stock"] == {"AAPL": earlier, "TSLA": now}
+    assert document["timeRetrieved"] == now
+
+def test_older_store_keeps_the_newest_time_retrieved(backend):
+    earlier = str(datetime.now(timezone.utc) - timedelta(minutes=1))
+    now = str(datetime.now(timezone.utc))
+    asyncio.run(backend.store({"stock": {"AAPL": {"close": [1.0]}}}, now))
+    # a slower worker finishing an older fetch after a newer one
+    asyncio.run(backend.store({"stock": {"TSLA": {"close": [2.0]}}}, earlier))
+
+    document = asyncio.run(backend.load())
+    assert document["timeRetrieved"] == now
+    assert document["retrieved"]["stock"] == {"AAPL": now, "TSLA": earlier}
+
+def test_load_requested_symbols(backend):
+    now = str(datetime.now(timezone.utc))
+    asyncio.run(backend.store({"stock": {"AAPL": {"close": [1.0]}, "TSLA": {"close": [2.0]}}}, now))
+    document = asyncio.run(backend.load({"stock": ["AAPL", "MSFT"]}))
+    # backends that cannot select return everything, the requested symbol is always there
+    assert document["stock"]["AAPL"] == {"close": [1.0]}
+    assert "MSFT" not in document["stock"]
+
+def test_workers_share_one_cache(backend):
+    # two workers over one shared backend: the second sees the first's fetch without refetching
+    ttls = {"currency": timedelta(hours=1), "stock": timedelta(minutes=30), "crypto": timedelta(minutes=5)}
+    first, second = MarketDataCache(backend, ttls), MarketDataCache(backend, ttls)
+    asyncio.run(second.reload())
+    asyncio.run(first.merge({"stock": {"AAPL": {"close": [1.0]}}}, str(datetime.now(timezone.utc))))
+
+    assert second.missing(stock=["AAPL"]) == {"stock": ["AAPL"]}
+    asyncio.run(second.reload(stock=["AAPL"]))
+    assert second.missing(stock=["AAPL"]) == {"stock": []}
+    assert second.select(stock=["AAPL"])["stock"]["AAPL"] == {"close": [1.0]}
+
+def test_create_cache_backend(monkeypatch, tmp_path):
+    monkeypatch.setenv("FINANCE_CACHE_PATH", str(tmp_path / "data.json"))
+    assert isinstance(create_cache_backend("file"), FileCacheBackend)
+    assert isinstance(create_cache_backend("memory"), MemoryCacheBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend("disk")
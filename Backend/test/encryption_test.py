@@ -1,6 +1,9 @@
+import asyncio
 import pytest
 import bcrypt
-from services.authentication.token.encryption import hash_password, verify_password
+from services.authentication.token.encryption import (
+    hash_password, verify_password, needs_rehash, PasswordHasher, PasswordHasherBusy
+)
 
 
 def test_hash_password_returns_bytes():
@@ -18,3 +21,35 @@ def test_verify_password_wrong_password():
     wrong_password = "wrongpassword"
     hashed = hash_password(password)
     assert verify_password(wrong_password, hashed) is False
+
+def test_needs_rehash_when_cost_changes():
+    hashed = hash_password("mysecretpassword", rounds=4)
+    assert needs_rehash(hashed, rounds=4) is False
+    assert needs_rehash(hashed, rounds=5) is True
+
+def test_password_hasher_caps_concurrency():
+    hasher = PasswordHasher(workers=2, max_queue=10)
+
+    async def run():
+        hashed = hash_password("mysecretpassword", rounds=4)
+        results = await asyncio.gather(*(hasher.verify("mysecretpassword", hashed) for _ in range(6)))
+        return results
+
+    assert asyncio.run(run()) == [True] * 6
+    stats = hasher.stats()
+    assert stats["completed"] == 6
+    assert stats["in_flight"] == 0 and stats["waiting"] == 0
+    assert stats["max_waiting"] >= 4
+
+def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, max_queue=1)
+
+    async def run():
+        hashed = hash_password("mysecretpassword", rounds=4)
+        return await asyncio.gather(
+            *(hasher.verify("mysecretpassword", hashed) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert sum(isinstance(result, PasswordHasherBusy) for result in results) == 1
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,82 @@
+import asyncio
+import csv
+import io
+from services.export.export import ExportController, EXPORT_COLUMNS
+
+
+def collect(lines):
+    async def run():
+        return [line async for line in lines]
+    return asyncio.run(run())
+
+def rows_of(*rows):
+    async def iterate():
+        for row in rows:
+            yield row
+    return iterate()
+
+def test_csv_lines_are_emitted_one_row_at_a_time():
+    controller = ExportController.__new__(ExportController)
+    rows = rows_of(
+        {"transaction_id": "1", "category_type": "food, drink", "amount": 1.5},
+        {"transaction_id": "2", "category_type": "salary", "amount": 10},
+    )
+    lines = collect(controller._lines(rows, EXPORT_COLUMNS["transactions"], "csv"))
+    assert lines[0].startswith("transaction_id,date,type")
+    assert len([line for line in lines if line]) == 3
+    parsed = list(csv.DictReader(io.StringIO("".join(lines))))
+    assert parsed[0]["category_type"] == "food, drink"
+    assert parsed[1]["amount"] == "10"
+
+def test_ndjson_lines():
+    controller = ExportController.__new__(ExportController)
+    lines = collect(controller._lines(rows_of({"id": "a"}, {"id": "b"}), EXPORT_COLUMNS["assets"], "ndjson"))
+    assert lines == ['{"id": "a"}\n', '{"id": "b"}\n']
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        for document in self._documents:
+            yield document
+
+class FakeCollection:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def find(self, query):
+        return FakeCursor([document for document in self._documents if document["user_id"] == query["user_id"]])
+
+    async def distinct(self, field, query):
+        return sorted({document[field] for document in self._documents if document["user_id"] == query["user_id"]})
+
+def test_transaction_export_snapshots_every_currency_of_the_user(monkeypatch):
+    from bson import ObjectId
+    from services.export import export
+    from services.finance.rate_table import RateTable
+
+    requested = []
+    rates = RateTable()
+    rates.update({"USDHKD=X": 8.0, "USDCHF=X": 0.8}, "2025-05-01T00:00:00+00:00")
+
+    async def fake_snapshot(currencies):
+        requested.append(sorted(currencies))
+        return rates
+
+    monkeypatch.setattr(export, "get_rate_snapshot", fake_snapshot)
+    controller = ExportController.__new__(ExportController)
+    controller._transaction_collection = FakeCollection([
+        {"_id": ObjectId(), "user_id": "u1", "currency_type": "CHF", "amount": 8.0},
+        {"_id": ObjectId(), "user_id": "u1", "currency_type": "HKD", "amount": 16.0},
+        {"_id": ObjectId(), "user_id": "u2", "currency_type": "JPY", "amount": 1.0},
+    ])
+    rows = collect(controller._transaction_rows("u1", "HKD"))
+    assert requested == [["CHF", "HKD", "HKD"]]
+    assert [row["converted_amount"] for row in rows] == [80.0, 16.0]
@@ -0,0 +1,138 @@
+import asyncio
+import time
+import pytest
+import pandas as pd
+from services.finance import finance_data_scraper
+from services.finance.market_cache import MarketDataCache
+from services.finance.cache_backends import FileCacheBackend
+from services.finance.ohlcv import OHLCV_FIELDS
+
+
+class SlowTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, **kwargs):
+        time.sleep(0.5 if self.symbol == "SLOW" else 0.1)
+        return pd.DataFrame(
+            {"Open": [1.0], "High": [2.0], "Low": [0.5], "Close": [1.5], "Volume": [100]},
+            index=pd.DatetimeIndex(["2025-05-09 09:30:00-04:00"]),
+        )
+
+
+@pytest.fixture
+def slow_yfinance(monkeypatch):
+    monkeypatch.setattr(finance_data_scraper.yf, "Ticker", SlowTicker)
+    monkeypatch.setattr(finance_data_scraper, "FETCH_TIMEOUT", 0.3)
+
+def test_batch_fetch_runs_concurrently(slow_yfinance):
+    start = time.perf_counter()
+    result = asyncio.run(finance_data_scraper._get_batch_yahoo_stock_data(["A", "B", "C", "D"]))
+    assert time.perf_counter() - start < 0.3
+    assert result["A"]["close"] == [1.5]
+
+def test_slow_symbol_times_out_without_failing_batch(slow_yfinance):
+    result = asyncio.run(finance_data_scraper._get_batch_yahoo_stock_data(["A", "SLOW"]))
+    # not cached as empty bars, the next request fetches it again
+    assert "SLOW" not in result
+    assert result["A"]["close"] == [1.5]
+
+@pytest.fixture
+def temp_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(finance_data_scraper, "market_cache", MarketDataCache(FileCacheBackend(str(tmp_path / "data.json"))))
+    return tmp_path
+
+def test_concurrent_misses_share_one_fetch(monkeypatch, temp_cache):
+    calls = []
+
+    async def fake_currency_rate(currencies):
+        calls.append(currencies)
+        await asyncio.sleep(0.1)
+        return {f"USD{currency}=X": 7.8 for currency in currencies}
+
+    async def fake_batch(symbols):
+        return {symbol: [] for symbol in symbols}
+
+    monkeypatch.setattr(finance_data_scraper, "_get_yahoo_currency_rate", fake_currency_rate)
+    monkeypatch.setattr(finance_data_scraper, "_get_batch_yahoo_stock_data", fake_batch)
+
+    async def burst():
+        return await asyncio.gather(*[finance_data_scraper.get_finance_data() for _ in range(10)])
+
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(result["currency"]["USDHKD=X"] == 7.8 for result in results)
+    assert list(temp_cache.iterdir()) == [temp_cache / "data.json"]
+
+def test_only_missing_symbols_are_fetched(monkeypatch, temp_cache):
+    fetched = []
+
+    async def fake_currency_rate(currencies):
+        return {f"USD{currency}=X": 7.8 for currency in currencies}
+
+    async def fake_batch(symbols):
+        fetched.extend(symbols)
+        return {symbol: {"timestamps": [0], **{field: [1.0] for field in OHLCV_FIELDS}} for symbol in symbols}
+
+    monkeypatch.setattr(finance_data_scraper, "_get_yahoo_currency_rate", fake_currency_rate)
+    monkeypatch.setattr(finance_data_scraper, "_get_batch_yahoo_stock_data", fake_batch)
+
+    asyncio.run(finance_data_scraper.get_finance_data(currencies=["HKD"], stocks=["AAPL"], cryptos=[]))
+    result = asyncio.run(finance_data_scraper.get_finance_data(currencies=["HKD"], stocks=["AAPL", "TSLA"], cryptos=[]))
+    assert fetched == ["AAPL", "TSLA"]
+    assert set(result["stock"]) == {"AAPL", "TSLA"}
+    assert result["stock"]["AAPL"]["close"] == [1.0]
+
+def test_row_format_is_opt_in(monkeypatch, temp_cache):
+    async def fake_batch(symbols):
+        return {symbol: {"timestamps": [0], **{field: [2.0] for field in OHLCV_FIELDS}} for symbol in symbols}
+
+    monkeypatch.setattr(finance_data_scraper, "_get_batch_yahoo_stock_data", fake_batch)
+    result = asyncio.run(
+        finance_data_scraper.get_finance_data(currencies=[], stocks=["AAPL"], cryptos=[], bar_format="rows")
+    )
+    assert result["stock"]["AAPL"] == [
+        {"Date": "1970-01-01T00:00:00Z", "Open": 2.0, "High": 2.0, "Low": 2.0, "Close": 2.0, "Volume": 2.0}
+    ]
+
+def test_queued_calls_are_not_timed_out_before_they_start(slow_yfinance, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # one worker: each 0.1s call fits the 0.3s timeout, the queue behind it does not
+    monkeypatch.setattr(finance_data_scraper, "_fetch_executor", ThreadPoolExecutor(max_workers=1))
+    result = asyncio.run(finance_data_scraper._get_batch_yahoo_stock_data(["A", "B", "C", "D", "E"]))
+    assert all(result[symbol]["close"] == [1.5] for symbol in "ABCDE")
+
+def test_failed_symbols_are_not_cached_or_refetched_per_request(monkeypatch, temp_cache):
+    fetched = []
+
+    async def fake_batch(symbols):
+        fetched.extend(symbols)
+        bars = {"timestamps": [0], **{field: [1.0] for field in OHLCV_FIELDS}}
+        return {symbol: bars for symbol in symbols if symbol != "FAIL"}
+
+    monkeypatch.setattr(finance_data_scraper, "_get_batch_yahoo_stock_data", fake_batch)
+    for _ in range(3):
+        result = asyncio.run(finance_data_scraper.get_finance_data(currencies=[], stocks=["AAPL", "FAIL"], cryptos=[]))
+    assert fetched == ["AAPL", "FAIL"]
+    assert set(result["stock"]) == {"AAPL"}
+
+def test_unresolved_currency_is_not_refetched_per_request(monkeypatch, temp_cache):
+    from services.finance import currency_conversion
+    from services.finance.rate_table import RateTable
+
+    calls = []
+
+    async def fake_currency_rate(currencies):
+        calls.append(sorted(currencies))
+        # yfinance leaves an unknown code out (NaN) while answering for the others
+        return {f"USD{currency}=X": 7.8 for currency in currencies if currency not in ("USD", "XYZ")}
+
+    monkeypatch.setattr(finance_data_scraper, "_get_yahoo_currency_rate", fake_currency_rate)
+    rates = RateTable()
+    monkeypatch.setattr(finance_data_scraper, "rate_table", rates)
+    monkeypatch.setattr(currency_conversion, "rate_table", rates)
+    for _ in range(3):
+        assert asyncio.run(currency_conversion.currency_conversion("USD", "XYZ", 1)) is None
+    assert len(calls) == 1
+    assert asyncio.run(currency_conversion.currency_conversion("USD", "HKD", 1)) == 7.8
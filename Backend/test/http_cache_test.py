@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from fastapi import Request
+from API.http_cache import ResponseCache, is_not_modified, last_modified, make_etag
+
+
+def _request(**headers) -> Request:
+    return Request({"type": "http", "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+def test_make_etag_depends_on_every_part():
+    assert make_etag("assets", "u1", (1,)) == make_etag("assets", "u1", (1,))
+    assert make_etag("assets", "u1", (1,)) != make_etag("assets", "u1", (2,))
+    assert make_etag("a").startswith('"') and make_etag("a").endswith('"')
+
+def test_if_none_match():
+    etag = make_etag("x")
+    assert is_not_modified(_request(if_none_match=etag), etag, None)
+    assert is_not_modified(_request(if_none_match=f'"other", W/{etag}'), etag, None)
+    assert is_not_modified(_request(if_none_match="*"), etag, None)
+    assert not is_not_modified(_request(if_none_match='"other"'), etag, None)
+    assert not is_not_modified(_request(), etag, None)
+
+def test_if_modified_since():
+    modified = datetime(2025, 5, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+    assert is_not_modified(_request(if_modified_since="Thu, 01 May 2025 12:00:00 GMT"), '"x"', modified)
+    assert not is_not_modified(_request(if_modified_since="Thu, 01 May 2025 11:59:59 GMT"), '"x"', modified)
+    assert not is_not_modified(_request(if_modified_since="junk"), '"x"', modified)
+    # an ETag check takes precedence
+    assert not is_not_modified(
+        _request(if_none_match='"other"', if_modified_since="Thu, 01 May 2025 12:00:00 GMT"), '"x"', modified
+    )
+
+def test_last_modified_takes_the_newest():
+    newest = last_modified("2025-05-01T00:00:00+00:00", None, datetime(2025, 5, 2))
+    assert newest == datetime(2025, 5, 2, tzinfo=timezone.utc)
+    assert last_modified(None) is None
+
+def test_response_cache_serves_only_a_matching_etag():
+    cache = ResponseCache()
+    cache.put(("k",), '"1"', b"[]", {})
+    assert cache.get(("k",), '"1"') == (b"[]", {})
+    assert cache.get(("k",), '"2"') is None
+    cache.put(("k",), '"2"', b"[1]", {"X-Next-Cursor": "c"})
+    assert len(cache) == 1
+    assert cache.get(("k",), '"2"') == (b"[1]", {"X-Next-Cursor": "c"})
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, max_bytes=10)
+    cache.put(("a",), '"1"', b"aaaa", {})
+    cache.put(("b",), '"1"', b"bbbb", {})
+    cache.get(("a",), '"1"')
+    cache.put(("c",), '"1"', b"cccc", {})
+    assert cache.get(("b",), '"1"') is None
+    assert cache.get(("a",), '"1"') is not None
+    # over the byte budget
+    cache.put(("d",), '"1"', b"dddddddd", {})
+    assert len(cache) == 1
+    cache.put(("e",), '"1"', b"e" * 11, {})
+    assert cache.get(("e",), '"1"') is None
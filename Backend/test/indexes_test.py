@@ -0,0 +1,36 @@
+import asyncio
+from pymongo.errors import OperationFailure
+from services.database.indexes import INDEXES, SUPERSEDED_INDEXES, ensure_indexes
+
+
+class FakeCollection:
+    def __init__(self, indexes):
+        self.indexes = indexes
+
+    async def create_indexes(self, models):
+        names = [model.document["name"] for model in models]
+        self.indexes.update(names)
+        return names
+
+    async def drop_index(self, name):
+        if name not in self.indexes:
+            raise OperationFailure("index not found", code=27)
+        self.indexes.remove(name)
+
+class FakeDatabase:
+    def __init__(self, indexes):
+        self.collections = {name: FakeCollection(set(indexes.get(name, ()))) for name in INDEXES}
+
+    async def list_collection_names(self):
+        return list(self.collections)
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+def test_superseded_indexes_are_dropped_after_their_replacement_exists():
+    database = FakeDatabase({"transaction": ["_id_", "user_id_datetime"]})
+    asyncio.run(ensure_indexes(database))
+    assert database["transaction"].indexes == {"_id_", "user_id_datetime_id"}
+    # nothing left to drop on the next startup
+    asyncio.run(ensure_indexes(database))
+    assert not set(SUPERSEDED_INDEXES["transaction"]) & database["transaction"].indexes
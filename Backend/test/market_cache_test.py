@@ -0,0 +1,52 @@
+import asyncio
+import json
+import pytest
+from datetime import datetime, timezone, timedelta
+from services.finance.cache_backends import FileCacheBackend
+from services.finance.market_cache import MarketDataCache
+
+
+TTLS = {"currency": timedelta(hours=1), "stock": timedelta(minutes=30), "crypto": timedelta(minutes=5)}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MarketDataCache(FileCacheBackend(str(tmp_path / "data.json")), TTLS)
+
+def test_empty_cache_reports_everything_missing(cache):
+    assert cache.missing(stock=["AAPL"], crypto=["BTC-USD"]) == {"stock": ["AAPL"], "crypto": ["BTC-USD"]}
+
+def test_merge_keeps_other_symbols(cache):
+    now = str(datetime.now(timezone.utc))
+    asyncio.run(cache.merge({"stock": {"AAPL": [{"Close": 1.0}]}}, now))
+    asyncio.run(cache.merge({"stock": {"TSLA": [{"Close": 2.0}]}}, now))
+    assert cache.missing(stock=["AAPL", "TSLA"]) == {"stock": []}
+    assert set(cache.select(stock=["AAPL", "TSLA"])["stock"]) == {"AAPL", "TSLA"}
+
+def test_ttl_is_per_asset_class(cache):
+    ten_minutes_ago = str(datetime.now(timezone.utc) - timedelta(minutes=10))
+    asyncio.run(cache.merge({"stock": {"AAPL": []}, "crypto": {"BTC-USD": []}}, ten_minutes_ago))
+    assert cache.missing(stock=["AAPL"], crypto=["BTC-USD"]) == {"stock": [], "crypto": ["BTC-USD"]}
+
+def test_reads_cache_without_per_symbol_timestamps(tmp_path):
+    path = tmp_path / "data.json"
+    now = str(datetime.now(timezone.utc))
+    path.write_text(json.dumps({"timeRetrieved": now, "currency": {"USDHKD=X": 7.8}, "stock": {}, "crypto": {}}))
+    cache = MarketDataCache(FileCacheBackend(str(path)), TTLS)
+    asyncio.run(cache.reload())
+    assert cache.missing(currency=["USDHKD=X"]) == {"currency": []}
+    assert cache.select(currency=["USDHKD=X"])["timeRetrieved"] == now
+
+def test_margin_treats_soon_expiring_symbols_as_missing(cache):
+    four_minutes_ago = str(datetime.now(timezone.utc) - timedelta(minutes=4))
+    asyncio.run(cache.merge({"crypto": {"BTC-USD": []}}, four_minutes_ago))
+    assert cache.missing(crypto=["BTC-USD"]) == {"crypto": []}
+    assert cache.missing(timedelta(minutes=2), crypto=["BTC-USD"]) == {"crypto": ["BTC-USD"]}
+
+def test_unavailable_symbols_wait_for_their_retry(cache):
+    cache.mark_unavailable("stock", ["NOPE"], timedelta(minutes=1))
+    cache.mark_unavailable("stock", ["GONE"], timedelta(0))
+    assert cache.missing(stock=["NOPE", "GONE", "AAPL"]) == {"stock": ["GONE", "AAPL"]}
+    # data arriving for it (e.g. from another worker's fetch) lifts the mark
+    asyncio.run(cache.merge({"stock": {"NOPE": {"close": []}}}, str(datetime.now(timezone.utc) - timedelta(hours=1))))
+    assert cache.missing(stock=["NOPE"]) == {"stock": ["NOPE"]}
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import logging
+from types import SimpleNamespace
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from services.monitoring.log_config import JsonFormatter
+from services.monitoring.metrics import MetricsMiddleware, MongoCommandMetrics
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+def test_middleware_labels_by_route_template():
+    app = FastAPI()
+
+    @app.get("/items/{token}")
+    async def item(token: str):
+        return {"token": token}
+
+    async def get(path):
+        scope = {
+            "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "headers": [], "scheme": "http", "server": ("test", 80), "root_path": "", "http_version": "1.1",
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await MetricsMiddleware(app)(scope, receive, send)
+
+    labels = {"method": "GET", "route": "/items/{token}", "status": "200"}
+    before = _sample("http_request_duration_seconds_count", **labels)
+    asyncio.run(get("/items/secret-a"))
+    asyncio.run(get("/items/secret-b"))
+    assert _sample("http_request_duration_seconds_count", **labels) == before + 2
+
+def test_mongo_listener_counts_commands_per_collection():
+    listener = MongoCommandMetrics()
+    labels = {"command": "find", "collection": "metrics_test", "outcome": "succeeded"}
+    before = _sample("mongo_commands_total", **labels)
+    event = SimpleNamespace(
+        command_name="find", command={"find": "metrics_test"}, connection_id=("localhost", 27017), request_id=1,
+        duration_micros=1500,
+    )
+    listener.started(event)
+    listener.succeeded(event)
+    assert _sample("mongo_commands_total", **labels) == before + 1
+    assert listener._collections == {}
+
+def test_json_formatter_keeps_extra_fields():
+    record = logging.LogRecord("finance", logging.WARNING, __file__, 1, "timed out", (), None)
+    record.symbol = "AAPL"
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "timed out"
+    assert entry["level"] == "WARNING"
+    assert entry["symbol"] == "AAPL"
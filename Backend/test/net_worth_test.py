@@ -0,0 +1,43 @@
+import pandas as pd
+from services.assets.net_worth import daily_closes, net_worth_frame
+
+DATES = pd.date_range("2025-01-01", "2025-01-05", freq="D", tz="UTC")
+
+
+def test_daily_closes_carry_forward_over_missing_days():
+    # stamped at New York midnight, 05:00 UTC
+    bars = {"timestamps": [1735794000, 1735966800], "close": [1.0, 2.0]}
+    assert daily_closes(bars, DATES).tolist() == [1.0, 1.0, 1.0, 2.0, 2.0]
+
+def test_daily_closes_without_bars():
+    assert daily_closes({"timestamps": [], "close": []}, DATES).isna().all()
+
+def test_net_worth_counts_holdings_from_the_day_they_were_added():
+    holdings = pd.DataFrame({
+        "category": ["STOCK", "CURRENCY", "CURRENCY"],
+        "type": ["AAPL", "HKD", "USD"],
+        "amount": [2.0, 78.0, 5.0],
+        "created_at": pd.to_datetime(["2024-12-01 00:00", "2025-01-03 10:00", "2024-01-01 00:00"], utc=True),
+    })
+    prices = {("STOCK", "AAPL"): pd.Series([10.0, 11.0, 12.0, 13.0, 14.0], index=DATES)}
+    usd_rates = {"HKD": pd.Series(7.8, index=DATES), "JPY": pd.Series(150.0, index=DATES)}
+
+    in_usd = net_worth_frame(holdings, prices, usd_rates, "USD", DATES)
+    assert in_usd["STOCK"].tolist() == [20.0, 22.0, 24.0, 26.0, 28.0]
+    assert in_usd["CURRENCY"].round(6).tolist() == [5.0, 5.0, 15.0, 15.0, 15.0]
+
+    in_jpy = net_worth_frame(holdings, prices, usd_rates, "JPY", DATES)
+    assert in_jpy.sum(axis=1).round(6).tolist() == [3750.0, 4050.0, 5850.0, 6150.0, 6450.0]
+
+def test_days_without_a_target_rate_have_no_value():
+    holdings = pd.DataFrame({
+        "category": ["STOCK"], "type": ["AAPL"], "amount": [1.0],
+        "created_at": pd.to_datetime(["2024-12-01"], utc=True),
+    })
+    prices = {("STOCK", "AAPL"): pd.Series(10.0, index=DATES)}
+    rates = pd.Series([float("nan"), float("nan"), 7.8, 7.8, 7.8], index=DATES)
+
+    values = net_worth_frame(holdings, prices, {"HKD": rates}, "HKD", DATES)
+    assert values["STOCK"].isna().tolist() == [True, True, False, False, False]
+    assert values["STOCK"].iloc[2] == 78.0
+    assert net_worth_frame(holdings, prices, {}, "XYZ", DATES)["STOCK"].isna().all()
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+from services.finance.ohlcv import frame_to_columns, columns_to_rows, as_columns, latest_close
+
+
+def make_frame():
+    return pd.DataFrame(
+        {
+            "Open": [1.0, 2.0, np.nan],
+            "High": [1.5, 2.5, 3.5],
+            "Low": [0.5, 1.5, 2.5],
+            "Close": [1.2, 2.2, 3.2],
+            "Volume": [100, np.nan, 300],
+        },
+        index=pd.DatetimeIndex(["2025-05-09 09:30", "2025-05-09 09:31", "2025-05-09 09:32"]).tz_localize(
+            "America/New_York"
+        ),
+    )
+
+def test_frame_to_columns_drops_incomplete_bars():
+    columns = frame_to_columns(make_frame())
+    assert columns["timestamps"] == [1746797400, 1746797460]
+    assert columns["close"] == [1.2, 2.2]
+    assert columns["volume"] == [100.0, 0.0]
+
+def test_empty_frame():
+    assert frame_to_columns(pd.DataFrame())["close"] == []
+    assert frame_to_columns(None)["timestamps"] == []
+
+def test_rows_round_trip():
+    columns = frame_to_columns(make_frame())
+    rows = columns_to_rows(columns)
+    assert rows[0] == {"Date": "2025-05-09T13:30:00Z", "Open": 1.0, "High": 1.5, "Low": 0.5, "Close": 1.2, "Volume": 100.0}
+    assert as_columns(rows) == columns
+
+def test_latest_close_reads_legacy_rows():
+    assert latest_close([{"Date": "2025-05-09 09:30:00-04:00", "Close": 3.0}]) == 3.0
+    assert latest_close({"timestamps": [], "close": []}) is None
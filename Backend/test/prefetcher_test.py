@@ -0,0 +1,26 @@
+import asyncio
+from services.finance import prefetcher
+from services.finance.prefetcher import MarketDataPrefetcher
+
+
+class FakeAssetCollection:
+    async def distinct(self, field, query):
+        category = query["category"]["$regex"].strip("^$")
+        return {"stock": ["tsla", "AAPL"], "crypto": ["sol"], "currency": ["EUR"]}[category]
+
+def test_watchlist_includes_held_symbols(monkeypatch):
+    monkeypatch.setenv("FINANCE_WATCHLIST_STOCKS", "AAPL")
+    watchlist = asyncio.run(MarketDataPrefetcher(FakeAssetCollection(), interval=60).watchlist())
+    assert watchlist["stocks"] == ["AAPL", "TSLA"]
+    assert "SOL" in watchlist["cryptos"]
+    assert "EUR" in watchlist["currencies"]
+
+def test_refresh_fetches_ahead_of_next_run(monkeypatch):
+    calls = []
+
+    async def fake_get_finance_data(**kwargs):
+        calls.append(kwargs)
+
+    monkeypatch.setattr(prefetcher, "get_finance_data", fake_get_finance_data)
+    asyncio.run(MarketDataPrefetcher(FakeAssetCollection(), interval=60).refresh())
+    assert calls[0]["refresh_within"] == 60
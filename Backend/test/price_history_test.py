@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+from services.finance.price_history import history_ticker, missing_ranges
+
+DAY = timedelta(days=1)
+TTL = timedelta(minutes=30)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+def test_history_ticker_matches_finance_naming():
+    assert history_ticker("btc", "crypto") == "BTC-USD"
+    assert history_ticker("hkd", "currency") == "USDHKD=X"
+    assert history_ticker("aapl", "stock") == "AAPL"
+
+def test_missing_ranges_without_coverage_stops_at_now():
+    now = utc(2025, 1, 10)
+    assert missing_ranges(None, utc(2025, 1, 1), utc(2025, 2, 1), now, TTL, DAY) == [(utc(2025, 1, 1), now)]
+
+def test_missing_ranges_inside_coverage_is_empty():
+    coverage = {"start": utc(2025, 1, 1), "end": utc(2025, 1, 10), "fetched_at": utc(2025, 1, 10)}
+    now = utc(2025, 1, 10, 0, 10)
+    assert missing_ranges(coverage, utc(2025, 1, 2), utc(2025, 1, 5), now, TTL, DAY) == []
+
+def test_missing_ranges_extend_both_sides_and_fill_gaps():
+    # naive datetimes as they come back from Mongo
+    coverage = {"start": datetime(2025, 1, 5), "end": datetime(2025, 1, 10), "fetched_at": datetime(2025, 1, 10)}
+    now = utc(2025, 1, 10, 0, 10)
+    assert missing_ranges(coverage, utc(2025, 1, 1), utc(2025, 1, 3), now, TTL, DAY) == [
+        (utc(2025, 1, 1), utc(2025, 1, 5))
+    ]
+
+def test_missing_ranges_refetch_stale_tail():
+    coverage = {"start": utc(2025, 1, 1), "end": utc(2025, 1, 10), "fetched_at": utc(2025, 1, 10)}
+    now = utc(2025, 1, 12)
+    assert missing_ranges(coverage, utc(2025, 1, 2), utc(2025, 1, 20), now, TTL, DAY) == [(utc(2025, 1, 9), now)]
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def sort(self, keys):
+        for field, _ in reversed(keys):
+            self._documents.sort(key=lambda document: document[field])
+        return self
+
+    async def __aiter__(self):
+        for document in self._documents:
+            yield document
+
+class FakeBars:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+    def find(self, query, projection):
+        timestamps = query["timestamp"]
+        return FakeCursor([
+            dict(document) for document in self.documents
+            if document["meta"]["symbol"] == query["meta.symbol"]
+            and timestamps["$gte"] <= document["timestamp"] < timestamps["$lt"]
+        ])
+
+class FakeCoverage:
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one(self, key, projection):
+        return self.documents.get((key["symbol"], key["interval"]))
+
+    async def update_one(self, key, update, upsert=False):
+        self.documents.setdefault((key["symbol"], key["interval"]), {}).update(update["$set"])
+
+def _store(monkeypatch, frames):
+    from services.finance import price_history
+
+    calls = []
+
+    async def fake_history(ticker, interval, start, end):
+        calls.append((start, end))
+        return frames.pop(0)
+
+    monkeypatch.setattr(price_history, "_get_yahoo_history", fake_history)
+    store = price_history.PriceHistoryStore.__new__(price_history.PriceHistoryStore)
+    store._bar_collection, store._coverage_collection = FakeBars(), FakeCoverage()
+    store._locks, store._retry_at = {}, {}
+    return store, calls
+
+def _frame(close, *days):
+    import pandas as pd
+
+    index = pd.DatetimeIndex([utc(2025, 1, day) for day in days])
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": 1.0}, index=index)
+
+def _bar(day, close, fetched_at):
+    return {
+        "timestamp": utc(2025, 1, day), "meta": {"symbol": "AAPL"}, "fetched_at": fetched_at,
+        "open": close, "high": close, "low": close, "close": close, "volume": 1.0,
+    }
+
+def test_refetched_bar_is_read_once_with_the_latest_values(monkeypatch):
+    import asyncio
+
+    store, calls = _store(monkeypatch, [])
+    now = datetime.now(timezone.utc)
+    store._bar_collection.documents = [_bar(2, 2.0, utc(2025, 1, 3)), _bar(2, 1.0, utc(2025, 1, 2)), _bar(3, 3.0, now)]
+    store._coverage_collection.documents[("AAPL", "1d")] = {"start": utc(2025, 1, 1), "end": now, "fetched_at": now}
+    history = asyncio.run(store.get_history("AAPL", "stock", "1d", utc(2025, 1, 1), now))
+    assert calls == []
+    assert history["bars"]["close"] == [2.0, 3.0]
+    assert store._locks == {}
+
+def test_empty_long_range_is_not_recorded_as_covered(monkeypatch):
+    import asyncio
+    import pandas as pd
+
+    store, calls = _store(monkeypatch, [pd.DataFrame(), _frame(1.0, 1, 2)])
+    start, end = utc(2025, 1, 1), utc(2025, 1, 20)
+    assert asyncio.run(store.ensure_range("AAPL", "stock", "1d", start, end)) == 0
+    assert store._coverage_collection.documents == {}
+    # not asked again until the retry time
+    assert asyncio.run(store.ensure_range("AAPL", "stock", "1d", start, end)) == 0
+    assert len(calls) == 1
+
+    store._retry_at.clear()
+    assert asyncio.run(store.ensure_range("AAPL", "stock", "1d", start, end)) == 1
+    assert store._coverage_collection.documents[("AAPL", "1d")]["end"] == end
+    assert store._locks == {}
@@ -0,0 +1,39 @@
+import pytest
+from datetime import datetime, timezone, timedelta
+from services.finance.rate_table import RateTable
+
+
+@pytest.fixture
+def table():
+    rate_table = RateTable()
+    rate_table.update({"USDHKD=X": 7.8, "USDJPY=X": 145.0}, str(datetime.now(timezone.utc)))
+    return rate_table
+
+def test_empty_table_is_not_fresh():
+    assert RateTable().is_fresh() is False
+
+def test_table_from_yesterday_is_not_fresh(table):
+    table.update({}, str(datetime.now(timezone.utc) - timedelta(days=1)))
+    assert table.is_fresh() is False
+
+def test_update_ignores_non_base_pairs(table):
+    table.update({"USDHKD=X": 7.8, "HKDJPY=X": 18.0}, str(datetime.now(timezone.utc)))
+    assert table.currencies() == {"USD", "HKD"}
+
+def test_convert_same_currency_returns_amount(table):
+    assert table.convert("hkd", "HKD", 10) == 10
+
+def test_convert_derives_cross_rate(table):
+    assert table.convert("HKD", "JPY", 7.8) == pytest.approx(145.0)
+
+def test_convert_unknown_currency_returns_none(table):
+    assert table.convert("USD", "EUR", 10) is None
+
+def test_cross_rates_covers_every_pair(table):
+    rates = table.cross_rates(["USD", "HKD", "JPY"])
+    assert len(rates) == 6
+    assert rates["JPYUSD=X"] == pytest.approx(1 / 145.0)
+
+def test_convert_many(table):
+    converted = table.convert_many([1, 2, 3], ["usd", "HKD", "EUR"], "HKD")
+    assert converted == [pytest.approx(7.8), 2, None]
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timezone
+from services.transaction.rollup import TransactionRollup
+
+
+TRANSACTION = {
+    "user_id": "u1",
+    "type": "expense",
+    "category_type": "Food",
+    "currency_type": "hkd",
+    "amount": 12.5,
+    "datetime": datetime(2025, 5, 3, tzinfo=timezone.utc),
+    "created_at": datetime(2025, 6, 1, tzinfo=timezone.utc),
+}
+
+def test_rollup_key_uses_transaction_month():
+    assert TransactionRollup.rollup_key(TRANSACTION) == {"user_id": "u1", "currency_type": "HKD", "month": "2025-05"}
+
+def test_rollup_key_falls_back_to_created_at():
+    assert TransactionRollup.rollup_key({**TRANSACTION, "datetime": None})["month"] == "2025-06"
+
+def test_increments_reverse_with_negative_sign():
+    assert TransactionRollup._increments(TRANSACTION, -1) == {
+        "count": -1,
+        "totals.expense": -12.5,
+        "categories.expense.Food": -12.5,
+    }
+
+def test_empty_names_still_give_valid_paths():
+    assert TransactionRollup._increments({**TRANSACTION, "category_type": "$"}) == {
+        "count": 1,
+        "totals.expense": 12.5,
+        "categories.expense._": 12.5,
+    }
+
+class FakeTransactions:
+    def __init__(self, groups):
+        self._groups = groups
+
+    async def aggregate(self, pipeline):
+        async def iterate():
+            for group in self._groups:
+                yield group
+        return iterate()
+
+def test_recompute_adds_up_categories_that_share_a_field():
+    groups = [
+        {"_id": {"user_id": "u1", "currency_type": "HKD", "month": "2025-05", "type": "expense", "category_type": name},
+         "total": total, "count": 1}
+        for name, total in (("a.b", 2.0), ("a_b", 3.0))
+    ]
+    rollup = TransactionRollup.__new__(TransactionRollup)
+    rollup._transaction_collection = FakeTransactions(groups)
+    rollups = asyncio.run(rollup._recompute("u1"))
+    assert rollups[("u1", "HKD", "2025-05")]["categories"] == {"expense": {"a_b": 5.0}}
+    assert rollups[("u1", "HKD", "2025-05")]["totals"] == {"expense": 5.0}
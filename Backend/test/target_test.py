@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from services.finance.rate_table import RateTable
+from services.user_target.target import period_start, target_progress
+
+
+def test_period_start():
+    now = datetime(2025, 5, 15, 13, 30, tzinfo=timezone.utc)  # a Thursday
+    assert period_start("week", now) == datetime(2025, 5, 12, tzinfo=timezone.utc)
+    assert period_start("month", now) == datetime(2025, 5, 1, tzinfo=timezone.utc)
+    assert period_start("year", now) == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert period_start("all", now) is None
+
+def test_target_progress_converts_each_currency_group_once():
+    rates = RateTable()
+    rates.update({"USDHKD=X": 8.0, "USDJPY=X": 160.0}, str(datetime.now(timezone.utc)))
+    target = {
+        "target_type": "Budget",
+        "transaction_type": "expense",
+        "amount": 50.0,
+        "currency": "USD",
+        "groups": [{"_id": "HKD", "total": 80.0, "count": 3}, {"_id": "USD", "total": 15.0, "count": 1}],
+    }
+    progress = target_progress(target, rates, "JPY")
+    assert progress["current_amount"] == 25.0
+    assert progress["transaction_count"] == 4
+    assert progress["progress"] == 0.5
+    assert progress["converted_amount"] == 8000.0
+    assert progress["converted_current_amount"] == 4000.0
+
+def test_target_progress_without_transactions():
+    rates = RateTable()
+    target = {"target_type": "Saving", "transaction_type": "income", "amount": 0, "currency": "USD", "groups": []}
+    progress = target_progress(target, rates, "USD")
+    assert progress["current_amount"] == 0.0
+    assert progress["progress"] is None
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from datetime import datetime, timezone
+from services.transaction.transaction import parse_transaction_date, encode_page_cursor, decode_page_cursor
+
+
+def test_parse_transaction_date_accepts_unpadded_dates():
+    assert parse_transaction_date("2025-5-1") == datetime(2025, 5, 1, tzinfo=timezone.utc)
+
+def test_parse_transaction_date_invalid_returns_none():
+    assert parse_transaction_date("not a date") is None
+    assert parse_transaction_date(None) is None
+
+def test_page_cursor_round_trip():
+    transaction_id = ObjectId()
+    cursor = encode_page_cursor({"datetime": "2025-05-01T00:00:00+00:00", "transaction_id": str(transaction_id)})
+    assert decode_page_cursor(cursor) == (datetime(2025, 5, 1, tzinfo=timezone.utc), transaction_id)
+
+def test_page_cursor_without_datetime():
+    transaction_id = ObjectId()
+    cursor = encode_page_cursor({"datetime": None, "transaction_id": str(transaction_id)})
+    assert decode_page_cursor(cursor) == (None, transaction_id)
+
+def test_decode_invalid_cursor_raises():
+    with pytest.raises(ValueError):
+        decode_page_cursor("junk")
+
+class FakeCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    async def to_list(self):
+        return self._documents
+
+class FakeAggregateCollection:
+    def __init__(self, groups):
+        self.groups = groups
+        self.pipeline = None
+
+    async def aggregate(self, pipeline):
+        self.pipeline = pipeline
+        return FakeCursor(self.groups)
+
+def test_transaction_summary_folds_currency_groups_into_periods(monkeypatch):
+    from services.finance.rate_table import RateTable
+    from services.transaction import transaction
+
+    rates = RateTable()
+    rates.update({"USDHKD=X": 8.0}, str(datetime.now(timezone.utc)))
+
+    async def fake_convert_many(amounts, from_currencies, to_currency, rates_snapshot=None):
+        return rates.convert_many(amounts, from_currencies, to_currency)
+
+    monkeypatch.setattr(transaction, "convert_many", fake_convert_many)
+    may, april = datetime(2025, 5, 1, tzinfo=timezone.utc), datetime(2025, 4, 1, tzinfo=timezone.utc)
+    groups = [
+        {"_id": {"period": may, "type": "expense", "category_type": "food", "currency_type": "HKD"}, "total": 80.0, "count": 2},
+        {"_id": {"period": may, "type": "expense", "category_type": "food", "currency_type": "USD"}, "total": 5.0, "count": 1},
+        {"_id": {"period": april, "type": "income", "category_type": "salary", "currency_type": "USD"}, "total": 100.0, "count": 1},
+        # no rate for XYZ, reported apart from the converted summary
+        {"_id": {"period": april, "type": "expense", "category_type": "food", "currency_type": "XYZ"}, "total": 9.0, "count": 1},
+    ]
+    controller = transaction.TransactionController.__new__(transaction.TransactionController)
+    controller._transaction_collection = FakeAggregateCollection(groups)
+
+    summary = asyncio.run(controller.get_transaction_summary("user", "hkd", "month"))
+    assert controller._transaction_collection.pipeline[0] == {"$match": {"user_id": "user"}}
+    assert summary["currency"] == "HKD"
+    assert summary["summary"] == [
+        {"period": may.isoformat(), "type": "expense", "category_type": "food", "total": 120.0, "count": 3},
+        {"period": april.isoformat(), "type": "income", "category_type": "salary", "total": 800.0, "count": 1},
+    ]
+    assert summary["totals"] == {"expense": 120.0, "income": 800.0}
+    assert summary["unconverted"] == [{
+        "period": april.isoformat(), "type": "expense", "category_type": "food",
+        "currency_type": "XYZ", "total": 9.0, "count": 1,
+    }]
+
+def test_transaction_request_rejects_empty_type():
+    from pydantic import ValidationError
+    from API.model.POST_transaction_data import TransactionPostRequest
+
+    payload = {"type": "expense", "category_type": "food", "currency_type": "HKD", "amount": 1.0, "date": "2025-5-1"}
+    TransactionPostRequest(**payload)
+    for field in ("type", "category_type"):
+        with pytest.raises(ValidationError):
+            TransactionPostRequest(**{**payload, field: ""})
+
+class FailingRollup:
+    def __init__(self):
+        self.stale = []
+
+    async def apply_many(self, transactions):
+        raise RuntimeError("rollup unavailable")
+
+    async def mark_stale(self, user_id):
+        self.stale.append(user_id)
+
+def test_failed_rollup_marks_user_stale_without_failing():
+    from services.transaction import transaction
+
+    controller = transaction.TransactionController.__new__(transaction.TransactionController)
+    controller._rollup = FailingRollup()
+    asyncio.run(controller._apply_rollup("user", [{"user_id": "user"}]))
+    assert controller._rollup.stale == ["user"]